@@ -0,0 +1,73 @@
+# Compares how long main takes to answer Slack with and without ack-first mode, and when the
+# last reply reached Slack, with the outbox on (default) and off (--no-outbox)
+#
+#   python benchmarks/ack_latency.py --latency 0.5 --events 50
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import warnings
+
+import function_app
+from slack_stub import SlackStub
+
+
+def make_request(i):
+    body = {
+        "type": "event_callback",
+        "event_id": f"EvBENCH{time.perf_counter_ns()}",
+        "event": {"type": "message", "channel": "C0BENCH", "user": "U0BENCH",
+                  "ts": f"1700000000.{i:06d}", "text": "I am locked out of my laptop"},
+    }
+    return function_app.make_request(json.dumps(body).encode())
+
+
+def measure(bot, stub, events):
+    timings = []
+    stub.reset()
+    first = time.perf_counter()
+    for i in range(events):
+        req = make_request(i)
+        start = time.perf_counter()
+        bot.main(req)
+        timings.append((time.perf_counter() - start) * 1000)
+    bot.dispatcher.drain()
+    while stub.calls["chat.postMessage"] < events and time.perf_counter() - first < 60:
+        time.sleep(0.01)  # Replies the outbox drainer still sends
+    return timings, time.perf_counter() - first
+
+
+def report(label, timings, sent):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<10} mean {statistics.mean(timings):8.2f} ms   p50 {statistics.median(timings):8.2f} ms   "
+          f"p95 {p95:8.2f} ms   max {timings[-1]:8.2f} ms   all replies sent after {sent:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the stub waits per Slack call")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--no-outbox", action="store_true", help="send the replies without the outbox")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="The top-level `text` argument is missing")
+
+    stub = SlackStub(latency=args.latency).start()
+    os.environ["SLACK_API_URL"] = stub.url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ["SLACK_OUTBOX_DB"] = "" if args.no_outbox else os.path.join(tempfile.mkdtemp(), "outbox.db")
+    bot = function_app.load("bot")
+
+    bot.slack_client.get_client().bot_id()  # warm the identity cache so both runs start equal
+    print(f"Slack API latency {args.latency * 1000:.0f} ms, {args.events} events, "
+          f"outbox {'off' if args.no_outbox else 'on'}")
+    for ack_first in (False, True):
+        bot.dispatcher.ACK_FIRST = ack_first
+        report("ack-first" if ack_first else "sync", *measure(bot, stub, args.events))
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
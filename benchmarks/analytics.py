@@ -0,0 +1,63 @@
+# Cost of the analytics counters: record() per handled event, the flush writing them to the day's file
+# and the stats query, first reading the whole file and then only what was appended since.
+#
+#   python benchmarks/analytics.py --events 100000 --channels 200
+import argparse
+import os
+import random
+import tempfile
+import time
+import timeit
+
+import function_app
+
+INTENTS = ["lock", "password", "duo", "thx", "help", "urgent", None]
+OUTCOMES = ["replied", "ignored", "not_bot_thread", "repeat", "suppressed", "filtered"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--flushes", type=int, default=50, help="flushes the events are spread over")
+    args = parser.parse_args()
+    os.environ["SLACK_ANALYTICS_DIR"] = tempfile.mkdtemp()
+    analytics = function_app.load("bot.analytics")
+
+    rng = random.Random(7)
+    dimensions = [{"intent": rng.choice(INTENTS), "channel": f"C{rng.randrange(args.channels):05d}",
+                   "outcome": rng.choice(OUTCOMES)} for _ in range(1000)]
+    number = 200000
+    us = timeit.timeit(lambda: analytics.record(dimensions[0]), number=number) / number * 1e6
+    analytics.flush()
+    print(f"record              {us:8.2f} us")
+
+    flush_ms = []
+    per_flush = args.events // args.flushes
+    for _ in range(args.flushes):
+        for i in range(per_flush):
+            analytics.record(dimensions[i % len(dimensions)])
+        start = time.perf_counter()
+        analytics.flush()
+        flush_ms.append((time.perf_counter() - start) * 1e3)
+    flush_ms.sort()
+    size = sum(os.path.getsize(os.path.join(analytics.ANALYTICS_DIR, name))
+               for name in os.listdir(analytics.ANALYTICS_DIR))
+    print(f"flush               {flush_ms[len(flush_ms) // 2]:8.2f} ms p50, {flush_ms[-1]:.2f} ms max"
+          f" ({args.events} events, {size // 1024} KB written)")
+
+    start = time.perf_counter()
+    stats = analytics.query(7, ("intent", "outcome"))
+    first = (time.perf_counter() - start) * 1e3
+    for i in range(per_flush):
+        analytics.record(dimensions[i % len(dimensions)])
+    start = time.perf_counter()
+    stats = analytics.query(7, ("intent", "outcome"))
+    incremental = (time.perf_counter() - start) * 1e3
+    print(f"query, whole file   {first:8.2f} ms")
+    print(f"query, appended     {incremental:8.2f} ms (one more flush of {per_flush} events)")
+    print(f"total {stats['total']}, resolution {stats['resolution']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Load test: the threaded bot function vs. the asyncio bot_async function against a slow Slack
+#
+#   python benchmarks/async_load.py --latency 0.2 --events 400 --threads 16 --concurrency 200
+import argparse
+import asyncio
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import function_app
+from slack_stub import SlackStub
+
+
+def make_request(i, run):
+    body = {
+        "type": "event_callback",
+        "event_id": f"Ev{run}{i:06d}",
+        "event": {"type": "message", "channel": "C0LOAD", "user": "U0LOAD",
+                  "ts": f"1700000000.{i:06d}", "text": "vpn is locked"},
+    }
+    return function_app.make_request(json.dumps(body).encode())
+
+
+def run_threaded(bot, events, threads):
+    requests = [make_request(i, "threaded") for i in range(events)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(bot.main, requests))
+    return time.perf_counter() - start
+
+
+async def run_async(bot_async, events, concurrency):
+    requests = [make_request(i, "async") for i in range(events)]
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(req):
+        async with limit:
+            await bot_async.main(req)
+
+    await bot_async.main(make_request(0, "warmup"))  # opens the shared session and caches auth.test
+    start = time.perf_counter()
+    await asyncio.gather(*(one(req) for req in requests))
+    elapsed = time.perf_counter() - start
+    await function_app.load("bot.slack_client").close_async_client()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds the stub waits per Slack call")
+    parser.add_argument("--events", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=16, help="worker threads for the sync function")
+    parser.add_argument("--concurrency", type=int, default=200, help="events in flight for the async function")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="The top-level `text` argument is missing")
+
+    stub = SlackStub(latency=args.latency).start()
+    os.environ["SLACK_API_URL"] = stub.url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    bot = function_app.load("bot")
+    bot_async = function_app.load("bot_async")
+    bot.slack_client.get_client().bot_id()
+
+    print(f"Slack API latency {args.latency * 1000:.0f} ms, {args.events} events")
+    elapsed = run_threaded(bot, args.events, args.threads)
+    print(f"threaded ({args.threads} threads)   {args.events / elapsed:8.1f} events/s  ({elapsed:.2f} s)")
+    elapsed = asyncio.run(run_async(bot_async, args.events, args.concurrency))
+    print(f"asyncio ({args.concurrency} in flight)  {args.events / elapsed:8.1f} events/s  ({elapsed:.2f} s)")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Off-hours lookup cost of the business-hours calendar as it grows to years of holidays for several
+# offices, against the old datetime.today().weekday() check, and a check that the default calendar
+# gives the same answers as that one.
+#
+#   python benchmarks/business_hours.py --offices 5 --years 10
+import argparse
+import datetime
+import json
+import os
+import random
+import timeit
+
+import function_app
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ZONES = ["Europe/Zagreb", "Europe/London", "America/New_York", "Asia/Kolkata", "Australia/Sydney"]
+
+
+def synthetic_calendar(offices, years, rng):
+    this_year = datetime.date.today().year
+    spec = {"offices": {}, "channels": {}}
+    for i in range(offices):
+        holidays = ["01-01", "12-25", "12-26"]
+        for year in range(this_year - years, this_year + years):
+            holidays += [datetime.date(year, rng.randint(1, 12), rng.randint(1, 28)).isoformat() for _ in range(12)]
+        day = datetime.date.today() + datetime.timedelta(days=rng.randint(0, 60))
+        spec["offices"][f"office{i}" if i else "default"] = {
+            "timezone": ZONES[i % len(ZONES)],
+            "workdays": ["mon", "tue", "wed", "thu", "fri"],
+            "hours": {"start": "08:00", "end": "17:00"},
+            "holidays": holidays,
+            "on_call": [{"start": f"{day}T08:00", "end": f"{day}T14:00"}],
+        }
+        spec["channels"][f"C{i:08d}"] = f"office{i}" if i else "default"
+    return spec
+
+
+def old_is_weekend():
+    return datetime.datetime.today().weekday() >= 5
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offices", type=int, default=5)
+    parser.add_argument("--years", type=int, default=10, help="years of holidays before and after today")
+    args = parser.parse_args()
+    business_hours = function_app.load("bot.business_hours")
+    rng = random.Random(7)
+
+    # The shipped calendar must answer exactly like the weekday check it replaced
+    with open(os.path.join(HERE, "..", "bot", "calendar.json")) as f:
+        default = business_hours.Calendar(json.load(f), datetime.date.today().year)
+    for _ in range(20000):
+        moment = rng.uniform(default.default.start, default.default.end)
+        expected = datetime.datetime.fromtimestamp(moment).weekday() >= 5
+        assert default.default.off_hours(moment) == expected, datetime.datetime.fromtimestamp(moment)
+    print("default calendar matches the weekday check on 20000 random instants")
+
+    spec = synthetic_calendar(args.offices, args.years, rng)
+    build_ms = timeit.timeit(lambda: business_hours.Calendar(spec, datetime.date.today().year), number=3) / 3 * 1000
+    calendar = business_hours.Calendar(spec, datetime.date.today().year)
+    holidays = sum(len(office["holidays"]) for office in spec["offices"].values())
+    bounds = sum(len(schedule.bounds) for schedule in calendar.offices.values())
+    print(f"{args.offices} offices, {holidays} holidays: built {bounds} boundaries in {build_ms:.1f} ms")
+
+    business_hours._calendar = calendar
+    number = 200000
+    channels = list(spec["channels"])
+    old_us = timeit.timeit(old_is_weekend, number=number) / number * 1e6
+    new_us = timeit.timeit(lambda: business_hours.off_hours(rng.choice(channels)), number=number) / number * 1e6
+    print(f"{'datetime.today().weekday() >= 5':<40}{old_us:>8.3f} us")
+    print(f"{'business_hours.off_hours(channel)':<40}{new_us:>8.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Cold start budget of the bot function: an -X importtime breakdown of loading it and the time
+# to serve the first event of each kind, every measurement in a fresh interpreter.
+#
+#   python benchmarks/cold_start.py --budget-ms 150
+#
+# azure.functions and asyncio are imported before the measurement because the Functions
+# Python worker has them loaded before it loads any function.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HOST_PRELOADED = "import azure.functions, asyncio"
+
+FIRST_REQUEST = """
+import json, os, time, warnings
+warnings.filterwarnings("ignore")
+from slack_stub import SlackStub
+stub = SlackStub().start()
+os.environ["SLACK_API_URL"] = stub.url
+os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+import function_app
+body = json.dumps({body}).encode()
+start = time.perf_counter()
+bot = function_app.load("bot")
+loaded = time.perf_counter()
+bot.main(function_app.make_request(body))
+done = time.perf_counter()
+print(json.dumps({{"import_ms": (loaded - start) * 1000, "first_request_ms": (done - loaded) * 1000,
+                  "slack_calls": sum(stub.calls.values())}}))
+"""
+
+EVENTS = {
+    "url_verification": {"type": "url_verification", "event": {"type": "url_verification"}, "challenge": "abc"},
+    "ignored event": {"event_id": "EvCOLD1", "event": {"type": "reaction_added", "user": "U1"}},
+    "message": {"event_id": "EvCOLD2", "event": {"type": "message", "user": "U1", "channel": "C1",
+                                                 "ts": "1.000001", "text": "my account is locked"}},
+}
+
+
+def run(code, *flags):
+    env = dict(os.environ, SLACK_OUTBOX_DB="", SLACK_TIMING_SAMPLE_RATE="0")
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=HERE, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_breakdown(top):
+    # Parse "-X importtime" output: (self us, cumulative us, module) for everything the function pulls in
+    result = run(f"{HOST_PRELOADED}\nimport sys; print('---', file=sys.stderr)\n"
+                 "import function_app; function_app.load('bot')", "-X", "importtime")
+    lines = result.stderr.split("---\n", 1)[1].splitlines()
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            modules.append((int(self_us), int(cumulative_us), name))
+    total = sum(self_us for self_us, _, _ in modules)
+    print(f"Importing the bot function: {total / 1000:.1f} ms in {len(modules)} modules, slowest (self time):")
+    for self_us, cumulative_us, name in sorted(modules, reverse=True)[:top]:
+        print(f"  {self_us / 1000:8.2f} ms  (cumulative {cumulative_us / 1000:8.2f} ms)  {name}")
+    return total / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=10, help="modules to list in the import breakdown")
+    parser.add_argument("--budget-ms", type=float, help="fail when import + first message exceeds this")
+    args = parser.parse_args()
+
+    import_breakdown(args.top)
+    print()
+    print(f"{'first event':<20}{'import':>12}{'first request':>16}{'slack calls':>14}")
+    worst = 0.0
+    for name, body in EVENTS.items():
+        result = json.loads(run(f"{HOST_PRELOADED}\n" + FIRST_REQUEST.format(body=repr(body))).stdout)
+        print(f"{name:<20}{result['import_ms']:>9.1f} ms{result['first_request_ms']:>13.1f} ms{result['slack_calls']:>14}")
+        worst = max(worst, result["import_ms"] + result["first_request_ms"])
+
+    if args.budget_ms is not None:
+        verdict = "within" if worst <= args.budget_ms else "OVER"
+        print(f"\nSlowest cold start {worst:.1f} ms, {verdict} the {args.budget_ms:.0f} ms budget")
+        if worst > args.budget_ms:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Handler latency while the Slack API is failing, with the outbox and circuit breaker in place
+#
+#   python benchmarks/degradation.py --latency 0.5 --events 30
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import warnings
+
+import function_app
+from slack_stub import SlackStub
+
+
+def post(bot, i):
+    body = {
+        "type": "event_callback",
+        "event_id": f"EvDEGRADE{i:06d}",
+        "event": {"type": "message", "channel": f"C{i:04d}", "user": "U0DEGRADE",
+                  "ts": f"1700000000.{i:06d}", "text": "my account is locked"},
+    }
+    start = time.perf_counter()
+    response = bot.main(function_app.make_request(json.dumps(body).encode()))
+    return (time.perf_counter() - start) * 1000, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the failing stub answers")
+    parser.add_argument("--events", type=int, default=30)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="The top-level `text` argument is missing")
+    logging.disable(logging.ERROR)
+
+    stub = SlackStub(latency=args.latency).start()
+    os.environ["SLACK_API_URL"] = stub.url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ["SLACK_OUTBOX_DB"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    os.environ.setdefault("SLACK_OUTBOX_BACKOFF", "0.5")
+    os.environ.setdefault("SLACK_BREAKER_RESET", "2")
+    bot = function_app.load("bot")
+    bot.slack_client.get_client().bot_id()
+
+    stub.error_status = 503
+    print(f"Slack answering 503 after {args.latency * 1000:.0f} ms")
+    for i in range(args.events):
+        elapsed, status = post(bot, i)
+        print(f"event {i:3d}  {elapsed:8.2f} ms  HTTP {status}  circuit {bot.outbox.breaker.state}")
+
+    stub.error_status = None
+    stub.latency = 0
+    print(f"Slack recovered, {bot.outbox.pending()} replies waiting in the outbox")
+    start = time.perf_counter()
+    while bot.outbox.pending() and time.perf_counter() - start < 30:
+        time.sleep(0.1)
+    print(f"outbox drained in {time.perf_counter() - start:.1f} s, "
+          f"{stub.calls['chat.postMessage']} chat.postMessage calls made in total")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
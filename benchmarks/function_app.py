@@ -0,0 +1,29 @@
+# Loads the function folders the way the Azure Functions Python worker does, as modules of an
+# "__app__" package, so that "from ..bot import ..." works outside the host as well
+import importlib
+import os
+import sys
+import types
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def load(name):
+    # The stub has no rate limits, lift the bot's own so they do not skew the measurements
+    os.environ.setdefault("SLACK_RATE_CHANNEL", "100000")
+    os.environ.setdefault("SLACK_RATE_CHANNEL_BURST", "100000")
+    os.environ.setdefault("SLACK_RATE_CHAT_POST", "6000000")
+    os.environ.setdefault("SLACK_RATE_REACTIONS_ADD", "6000000")
+    # The benchmarks send the same user's messages over and over, which the reply suppression would skip
+    os.environ.setdefault("SLACK_SUPPRESS_USER_WINDOW", "0")
+    os.environ.setdefault("SLACK_SUPPRESS_CHANNEL_WINDOW", "0")
+    if "__app__" not in sys.modules:
+        app = types.ModuleType("__app__")
+        app.__path__ = [ROOT]
+        sys.modules["__app__"] = app
+    return importlib.import_module(f"__app__.{name}")
+
+
+def make_request(body, headers=None):
+    import azure.functions as func
+    return func.HttpRequest(method="POST", url="/api/bot", headers=headers or {}, body=body)
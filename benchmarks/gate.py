@@ -0,0 +1,79 @@
+# Cost of the pre-parse gate (signature check and noise scan) per recorded event, the time main
+# takes for the events it filters against the ones it parses, and a check that no event the bot
+# answers is filtered and that unsigned, tampered or stale requests are rejected.
+#
+#   python benchmarks/gate.py
+import hashlib
+import hmac
+import json
+import logging
+import os
+import tempfile
+import time
+import timeit
+
+import function_app
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+
+
+def signed(body, secret=SECRET, timestamp=None):
+    timestamp = str(int(timestamp or time.time()))
+    digest = hmac.new(secret.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    return {"X-Slack-Request-Timestamp": timestamp, "X-Slack-Signature": f"v0={digest}"}
+
+
+def main():
+    logging.disable(logging.ERROR)
+    os.environ["SLACK_SIGNING_SECRET"] = SECRET
+    os.environ["SLACK_OUTBOX_DB"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    bot = function_app.load("bot")
+    gate = bot.gate
+    with open(os.path.join(HERE, "events.json")) as f:
+        mixes = json.load(f)
+
+    body = json.dumps(mixes["weekday"]["events"][0]).encode()
+    for label, headers, expected in [
+        ("signed", signed(body), 200),
+        ("unsigned", {}, 401),
+        ("wrong secret", signed(body, secret="x" * 32), 401),
+        ("stale", signed(body, timestamp=time.time() - 600), 401),
+    ]:
+        req = function_app.make_request(body, headers)
+        status = 200 if gate.verify(req, body) else 401
+        assert status == expected, label
+    tampered = body.replace(b"locked", b"LOCKED")
+    assert not gate.verify(function_app.make_request(tampered, signed(body)), tampered)
+    print("signature: signed accepted, unsigned / wrong secret / stale / tampered rejected")
+
+    number = 20000
+    print(f"\n{'mix':<10}{'event':<28}{'gate':>10}{'verdict':>18}")
+    for name, mix in mixes.items():
+        for payload in mix["events"]:
+            body = json.dumps(payload).encode()
+            req = function_app.make_request(body, signed(body))
+            verdict = gate.noise(body)
+            if name != "ignored":
+                assert verdict is None, (name, payload["event"].get("text"))
+            us = timeit.timeit(lambda: (gate.verify(req, body), gate.noise(body)), number=number) / number * 1e6
+            event = payload["event"]
+            label = event.get("subtype") or event.get("text") or event["type"]
+            print(f"{name:<10}{label[:26]:<28}{us:>7.2f} us{verdict or 'parsed':>18}")
+
+    # Whole handler for a filtered event against one that is parsed and turns out to need no reply
+    filtered = json.dumps(mixes["ignored"]["events"][1]).encode()
+    parsed = json.dumps(mixes["ignored"]["events"][3]).encode()
+    print()
+    for label, body in (("main, filtered by the gate", filtered), ("main, parsed and ignored", parsed)):
+        def one():
+            payload = json.loads(body)
+            payload["event_id"] = f"Ev{time.perf_counter_ns()}"
+            data = json.dumps(payload).encode()
+            bot.main(function_app.make_request(data, signed(data)))
+        us = timeit.timeit(one, number=2000) / 2000 * 1e6
+        print(f"{label:<38}{us:>8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Offline evaluation of the intent classifier on a labelled message set (benchmarks/intent_messages.json,
+# [{"text": ..., "intent": ...}] with "none" for messages that get no reply): 5-fold cross-validated
+# accuracy of the keywords, the model alone and the model with keyword fallback below the threshold,
+# plus single message latency and batch throughput. --train writes a model trained on the whole set
+# for SLACK_CLASSIFIER_MODEL.
+#
+#   python benchmarks/intent_classifier.py
+#   python benchmarks/intent_classifier.py --train bot/intent_model.npz
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+
+import function_app
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def keyword_table():
+    rules = function_app.load("bot.rules")
+    with open(os.path.join(HERE, "..", "bot", "rules.json")) as f:
+        return rules.RuleTable(json.load(f))
+
+
+def predicted(table, text, classify=None):
+    # What the bot does with a new message on a weekday: an intent name or "none"
+    return table.match(text, False, False, classify) or "none"
+
+
+def evaluate(classifier, table, items, threshold, folds=5):
+    items = list(items)
+    random.Random(7).shuffle(items)
+    results = Counter()
+    wrong = Counter()
+    for fold in range(folds):
+        test = items[fold::folds]
+        train = [item for i, item in enumerate(items) if i % folds != fold]
+        model = classifier.train([item["text"] for item in train], [item["intent"] for item in train])
+
+        def classify(text, intents):
+            intent, probability = model.predict([text])[0]
+            return intent if probability >= threshold else None
+
+        for item, (intent, probability) in zip(test, model.predict([item["text"] for item in test])):
+            expected = item["intent"]
+            keywords = predicted(table, item["text"])
+            combined = predicted(table, item["text"], classify)
+            results["keywords"] += keywords == expected
+            results["model"] += intent == expected
+            results["model + fallback"] += combined == expected
+            results["fallbacks"] += probability < threshold
+            if combined != expected:
+                wrong[(expected, combined)] += 1
+    return results, wrong
+
+
+def latency(model, texts):
+    single = []
+    for text in texts * 5:
+        start = time.perf_counter()
+        model.predict([text])
+        single.append((time.perf_counter() - start) * 1e6)
+    single.sort()
+    batch = (texts * (1000 // len(texts) + 1))[:1000]
+    start = time.perf_counter()
+    for _ in range(5):
+        model.predict(batch)
+    throughput = 5 * len(batch) / (time.perf_counter() - start)
+    return single[len(single) // 2], single[int(len(single) * 0.99)], throughput
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=os.path.join(HERE, "intent_messages.json"))
+    parser.add_argument("--threshold", type=float, default=None, help="default SLACK_CLASSIFIER_THRESHOLD")
+    parser.add_argument("--train", metavar="MODEL", help="train on the whole set and write the model file")
+    args = parser.parse_args()
+    classifier = function_app.load("bot.classifier")
+    threshold = classifier.THRESHOLD if args.threshold is None else args.threshold
+    with open(args.data) as f:
+        items = json.load(f)
+
+    if args.train:
+        model = classifier.train([item["text"] for item in items], [item["intent"] for item in items])
+        model.save(args.train)
+        print(f"Trained on {len(items)} messages ({', '.join(model.intents)}), saved {args.train}")
+        return
+
+    table = keyword_table()
+    results, wrong = evaluate(classifier, table, items, threshold)
+    print(f"{len(items)} labelled messages, 5-fold cross-validation, threshold {threshold}")
+    for name in ("keywords", "model", "model + fallback"):
+        print(f"{name:<20}{results[name] / len(items):>8.1%}")
+    print(f"{'fell back':<20}{results['fallbacks'] / len(items):>8.1%}")
+    print("most common mistakes (expected -> answered):")
+    for (expected, answered), count in wrong.most_common(5):
+        print(f"  {expected} -> {answered}: {count}")
+
+    model = classifier.train([item["text"] for item in items], [item["intent"] for item in items])
+    p50, p99, throughput = latency(model, [item["text"] for item in items])
+    print(f"\nsingle message      p50 {p50:7.1f} us   p99 {p99:7.1f} us")
+    print(f"batches of 1000     {throughput:9.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
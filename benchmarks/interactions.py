@@ -0,0 +1,92 @@
+# Button clicks on the bot's replies: posts a reply, then sends Slack's form-encoded block_actions
+# payloads for its buttons through main and reports the time to the ack, which does not wait for the
+# follow-up work, and the clicks counted per intent and button once that work has run.
+#
+#   python benchmarks/interactions.py --clicks 2000
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import warnings
+from urllib.parse import quote_plus
+
+import function_app
+from slack_stub import SlackStub
+
+BUTTONS = {"lock": ["open-sspr-unlock", "open-sspr-enroll"], "password": ["open-change-password"],
+           "duo": ["open-duo-ticket"]}
+TEXTS = {"lock": "my account is locked", "password": "password expired", "duo": "duo does not work"}
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def click_body(action_id, thread_ts):
+    payload = {
+        "type": "block_actions", "user": {"id": "U00001"}, "team": {"id": "T00001"},
+        "container": {"type": "message", "message_ts": "1700000001.000100", "channel_id": "C0HELP"},
+        "channel": {"id": "C0HELP"},
+        "message": {"type": "message", "ts": "1700000001.000100", "thread_ts": thread_ts},
+        "actions": [{"action_id": action_id, "block_id": "b1", "type": "button", "value": "click_me_123",
+                     "action_ts": "1700000002.000200"}],
+        "response_url": "https://hooks.slack.com/actions/T00001/1/x",
+    }
+    return ("payload=" + quote_plus(json.dumps(payload))).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clicks", type=int, default=2000)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="The top-level `text` argument is missing")
+    logging.disable(logging.INFO)
+
+    stub = SlackStub().start()
+    folder = tempfile.mkdtemp()
+    os.environ["SLACK_API_URL"] = stub.url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ["SLACK_OUTBOX_DB"] = ""
+    os.environ["SLACK_THREADS_DB"] = ""
+    os.environ["SLACK_ANALYTICS_DIR"] = folder
+    bot = function_app.load("bot")
+    bot.is_weekend = lambda channel=None: False
+
+    # One reply per intent, its thread is where the buttons get clicked
+    threads = {}
+    for i, (intent, text) in enumerate(TEXTS.items()):
+        ts = f"1700000000.{i:06d}"
+        body = {"type": "event_callback", "event_id": f"EvINT{i}",
+                "event": {"type": "message", "channel": "C0HELP", "user": "U00001", "ts": ts, "text": text}}
+        bot.main(function_app.make_request(json.dumps(body).encode()))
+        threads[intent] = ts
+
+    bodies = [click_body(action_id, threads[intent]) for intent, buttons in BUTTONS.items() for action_id in buttons]
+    requests = [function_app.make_request(bodies[i % len(bodies)],
+                                          {"Content-Type": "application/x-www-form-urlencoded"})
+                for i in range(args.clicks)]
+    acks = []
+    statuses = set()
+    for req in requests:
+        start = time.perf_counter()
+        response = bot.main(req)
+        acks.append((time.perf_counter() - start) * 1e3)
+        statuses.add(response.status_code)
+    start = time.perf_counter()
+    bot.dispatcher.drain()
+    follow_up = time.perf_counter() - start
+    acks.sort()
+    print(f"{args.clicks} clicks, status {sorted(statuses)}")
+    print(f"ack       p50 {percentile(acks, 0.5):6.3f} ms   p99 {percentile(acks, 0.99):6.3f} ms")
+    print(f"follow-ups still running after the last ack finished in {follow_up * 1e3:.1f} ms")
+    print("clicks per intent and button:")
+    for row in bot.analytics.query(1, ("intent", "outcome"))["rows"]:
+        if row["outcome"].startswith("clicked:"):
+            print(f"  {row['intent']:<10}{row['outcome'][len('clicked:'):]:<24}{row['count']:>6}")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Compares the compiled KeywordMatcher with the old any(keyword in text.lower()) scans
+#
+#   python benchmarks/keyword_matcher.py --keywords 500 --words 400
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+from matcher import KeywordMatcher  # noqa: E402
+
+LOCK = ['locked', 'unlock', 'blocked', 'locking', 'lock', 'login', 'connect', 'vpn']
+PASSWORD = ['password', 'expired', 'credentials']
+DUO = ['duo', '2fa']
+
+
+def any_scans(text, intents):
+    # What main used to do: lowercase and scan every list in turn
+    for intent, keywords in intents:
+        if any(keyword in text.lower() for keyword in keywords):
+            return intent
+    return None
+
+
+def synthetic_keywords(count, rng):
+    return ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 12))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", type=int, default=500, help="extra keywords added to each intent")
+    parser.add_argument("--words", type=int, default=400, help="words in the long message")
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    filler = " ".join(rng.choice(["please", "help", "my", "laptop", "today", "again", "the", "screen"])
+                      for _ in range(args.words))
+    messages = {
+        "short hit": "I am locked out",
+        "long, hit at end": filler + " my duo push does not arrive",
+        "long, no hit": filler,
+    }
+    tables = {
+        "repo keywords": [("lock", LOCK), ("password", PASSWORD), ("duo", DUO)],
+        f"+{args.keywords} keywords/intent": [
+            ("lock", LOCK + synthetic_keywords(args.keywords, rng)),
+            ("password", PASSWORD + synthetic_keywords(args.keywords, rng)),
+            ("duo", DUO + synthetic_keywords(args.keywords, rng)),
+        ],
+    }
+
+    print(f"{'table':<26}{'message':<20}{'any() scans':>14}{'matcher':>14}")
+    for table_name, intents in tables.items():
+        matcher = KeywordMatcher(intents)
+        for message_name, text in messages.items():
+            old = timeit.timeit(lambda: any_scans(text, intents), number=args.number) / args.number * 1e6
+            new = timeit.timeit(lambda: matcher.match(text), number=args.number) / args.number * 1e6
+            print(f"{table_name:<26}{message_name:<20}{old:>11.2f} us{new:>11.2f} us")
+
+
+if __name__ == "__main__":
+    main()
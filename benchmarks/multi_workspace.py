@@ -0,0 +1,86 @@
+# Serves events from many workspaces with one deployment and reports the latency of each workspace's
+# first event against the warm ones, the auth.test calls made and the clients kept, with and without
+# eviction (--max-teams below --teams).
+#
+#   python benchmarks/multi_workspace.py --teams 40 --events 2000
+#   python benchmarks/multi_workspace.py --teams 40 --max-teams 10
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import function_app
+from slack_stub import SlackStub
+
+
+def make_request(team, i):
+    body = {
+        "type": "event_callback", "team_id": team, "api_app_id": "A0BENCH",
+        "event_id": f"EvTEAM{time.perf_counter_ns()}{i}",
+        "event": {"type": "message", "channel": f"C{team}", "user": "U0BENCH",
+                  "ts": f"1700000000.{i:06d}", "text": "I am locked out of my laptop"},
+    }
+    return function_app.make_request(json.dumps(body).encode())
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teams", type=int, default=40)
+    parser.add_argument("--max-teams", type=int, default=50, help="SLACK_MAX_TEAMS")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds the stub waits per Slack call")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="The top-level `text` argument is missing")
+    logging.disable(logging.ERROR)
+
+    stub = SlackStub(latency=args.latency).start()
+    teams = [f"T{i:05d}" for i in range(args.teams)]
+    os.environ["SLACK_API_URL"] = stub.url
+    os.environ["SLACK_BOT_TOKENS"] = json.dumps({team: f"xoxb-{team}" for team in teams})
+    os.environ["SLACK_MAX_TEAMS"] = str(args.max_teams)
+    os.environ["SLACK_OUTBOX_DB"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    bot = function_app.load("bot")
+    bot.is_weekend = lambda channel=None: False
+
+    # A few busy workspaces and a long tail of quiet ones
+    rng = random.Random(7)
+    weights = [1 / (rank + 1) for rank in range(len(teams))]
+    picks = rng.choices(teams, weights, k=args.events)
+    first, warm = [], []
+    seen = set()
+
+    def one(item):
+        i, team = item
+        is_first = team not in seen
+        seen.add(team)
+        start = time.perf_counter()
+        bot.main(make_request(team, i))
+        (first if is_first else warm).append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, enumerate(picks)))
+    elapsed = time.perf_counter() - start
+    stub.stop()
+
+    print(f"{args.events} events from {len(set(picks))} workspaces, SLACK_MAX_TEAMS={args.max_teams}")
+    print(f"first event per workspace  p50 {percentile(first, 0.5):7.2f} ms   p95 {percentile(first, 0.95):7.2f} ms")
+    print(f"warm events                p50 {percentile(warm, 0.5):7.2f} ms   p95 {percentile(warm, 0.95):7.2f} ms")
+    print(f"throughput                 {args.events / elapsed:7.1f} events/s")
+    print(f"auth.test calls            {stub.calls['auth.test']}")
+    print(f"clients kept               {len(bot.slack_client._clients)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Summary of the profiles written by the live handler (SLACK_PROFILE_RATE / X-Bot-Profile, see bot/profiling.py):
+# the profiles of each branch (lock, password, duo, weekend, thx, not_bot_thread, ...) are merged and the
+# functions taking the most time and the lines allocating the most memory are listed per branch.
+#
+#   python benchmarks/profiles.py                      # SLACK_PROFILE_DIR or the default folder
+#   python benchmarks/profiles.py <folder> --branch lock --top 30 --sort tottime
+#   python benchmarks/profiles.py --sign               # X-Bot-Profile value for a request, uses SLACK_PROFILE_SECRET
+import argparse
+import glob
+import io
+import json
+import os
+import pstats
+import time
+from collections import defaultdict
+
+import function_app
+
+
+def by_branch(folder):
+    # {branch: [profile path without extension]}
+    branches = defaultdict(list)
+    for path in sorted(glob.glob(os.path.join(folder, "*.prof"))):
+        name = os.path.basename(path)[:-len(".prof")]
+        branches[name.rsplit("-", 2)[0]].append(path[:-len(".prof")])
+    return branches
+
+
+def allocations(bases):
+    # Allocation sites of the invocations summed up, as [(size, count, site, code)] largest first
+    merged = defaultdict(lambda: [0, 0, ""])
+    for base in bases:
+        try:
+            with open(base + ".alloc.json") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for entry in entries:
+            site = merged[f"{entry['file']}:{entry['line']}"]
+            site[0] += entry["size"]
+            site[1] += entry["count"]
+            site[2] = entry.get("code", "")
+    return sorted(((size, count, site, code) for site, (size, count, code) in merged.items()), reverse=True)
+
+
+def summarize(branch, bases, top, sort):
+    stats = pstats.Stats(*(base + ".prof" for base in bases), stream=io.StringIO())
+    print(f"== {branch}: {len(bases)} invocations, {stats.total_tt / len(bases) * 1000:.2f} ms profiled on average")
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+    lines = stats.stream.getvalue().splitlines()
+    start = next((i for i, line in enumerate(lines) if line.lstrip().startswith("ncalls")), len(lines))
+    print("\n".join(line for line in lines[start:] if line.strip()))
+    sites = allocations(bases)
+    if sites:
+        print(f"-- largest allocations, per invocation")
+        for size, count, site, code in sites[:top]:
+            print(f"{size / len(bases) / 1024:9.1f} KiB {count / len(bases):8.1f} blocks  {site}  {code}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", help="default SLACK_PROFILE_DIR")
+    parser.add_argument("--branch", action="append", help="only these branches")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key, e.g. cumulative, tottime, ncalls")
+    parser.add_argument("--sign", action="store_true", help="print an X-Bot-Profile header value and exit")
+    args = parser.parse_args()
+    profiling = function_app.load("bot.profiling")
+    if args.sign:
+        if not profiling.SECRET:
+            parser.error("SLACK_PROFILE_SECRET is not set")
+        print(f"{profiling.HEADER}: {profiling.sign(int(time.time()))}")
+        return
+
+    folder = args.folder or profiling.PROFILE_DIR
+    branches = by_branch(folder)
+    if not branches:
+        print(f"No profiles in {folder}")
+        return
+    print(f"{folder}: " + ", ".join(f"{branch} {len(bases)}" for branch, bases in sorted(branches.items())) + "\n")
+    for branch, bases in sorted(branches.items()):
+        if not args.branch or branch in args.branch:
+            summarize(branch, bases, args.top, args.sort)
+
+
+if __name__ == "__main__":
+    main()
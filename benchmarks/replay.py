@@ -0,0 +1,149 @@
+# Replays recorded Slack event payloads (benchmarks/events.json) into bot.main as real
+# func.HttpRequest objects, with the Slack Web API served by the local stub, and reports
+# handler latency, throughput and Slack calls per event for each traffic mix.
+#
+#   python benchmarks/replay.py --rounds 50 --latency 0.05 --error-rate 0.01
+#   python benchmarks/replay.py --compare benchmarks/results/<earlier run>.json
+#
+# Results are written to benchmarks/results/<date>-<git revision>.json.
+import argparse
+import copy
+import datetime
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import function_app
+from slack_stub import SlackStub
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS = os.path.join(HERE, "results")
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def requests_for(events, rounds):
+    # Every replayed event gets its own event_id and ts, otherwise the dedup cache would drop them
+    requests = []
+    for i in range(rounds):
+        for j, payload in enumerate(events):
+            payload = copy.deepcopy(payload)
+            payload["event_id"] = f"EvREPLAY{i:05d}{j:03d}{time.perf_counter_ns()}"
+            payload["event"]["ts"] = f"{1718000000 + i}.{j:06d}"
+            if "thread_ts" in payload["event"]:
+                payload["event"]["thread_ts"] = f"{1717999000 + i}.000200"  # A new thread each round
+            requests.append(function_app.make_request(json.dumps(payload).encode()))
+    return requests
+
+
+def replay(bot, stub, mix, rounds, concurrency):
+    weekend = mix["weekend"]
+    bot.is_weekend = lambda channel=None: weekend  # Replay against a fixed weekday / weekend clock
+    requests = requests_for(mix["events"], rounds)
+    for i in range(rounds):
+        # Replies are only answered in threads the bot started, as if it had answered their first message
+        bot.threads.record({"channel": "C05ITHELP01", "ts": f"{1717999000 + i}.000200"}, "weekend")
+    timings = []
+
+    def one(req):
+        start = time.perf_counter()
+        bot.main(req)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    stub.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, requests))
+    elapsed = time.perf_counter() - start
+    bot.dispatcher.drain()
+    timings.sort()
+    return {
+        "events": len(requests),
+        "p50_ms": percentile(timings, 0.50),
+        "p95_ms": percentile(timings, 0.95),
+        "p99_ms": percentile(timings, 0.99),
+        "throughput_eps": len(requests) / elapsed,
+        "slack_calls_per_event": sum(stub.calls.values()) / len(requests),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results, baseline=None):
+    columns = ["p50_ms", "p95_ms", "p99_ms", "throughput_eps", "slack_calls_per_event"]
+    print(f"{'mix':<10}{'events':>8}" + "".join(f"{column:>24}" for column in columns))
+    for name, result in results.items():
+        line = f"{name:<10}{result['events']:>8}"
+        for column in columns:
+            cell = f"{result[column]:.3f}"
+            if baseline and name in baseline:
+                before = baseline[name][column]
+                change = (result[column] - before) / before * 100 if before else 0.0
+                cell += f" ({change:+.0f}%)"
+            line += f"{cell:>24}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50, help="times each recorded event is replayed")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the stub waits per Slack call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Slack calls answered with 503")
+    parser.add_argument("--concurrency", type=int, default=1, help="events handled at the same time")
+    parser.add_argument("--ack-first", action="store_true", help="replay with SLACK_ACK_FIRST on")
+    parser.add_argument("--mix", action="append", help="only replay these mixes (weekday, weekend, thread, ignored)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="The top-level `text` argument is missing")
+    logging.disable(logging.ERROR)
+
+    with open(os.path.join(HERE, "events.json")) as f:
+        mixes = json.load(f)
+    if args.mix:
+        mixes = {name: mixes[name] for name in args.mix}
+
+    stub = SlackStub(latency=args.latency, error_rate=args.error_rate).start()
+    os.environ["SLACK_API_URL"] = stub.url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ["SLACK_OUTBOX_DB"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    os.environ["SLACK_THREADS_DB"] = os.path.join(tempfile.mkdtemp(), "threads.db")
+    bot = function_app.load("bot")
+    bot.dispatcher.ACK_FIRST = args.ack_first
+    bot.slack_client.get_client().bot_id()
+
+    results = {name: replay(bot, stub, mix, args.rounds, args.concurrency) for name, mix in mixes.items()}
+    stub.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if not args.no_save:
+        revision = git_revision()
+        os.makedirs(RESULTS, exist_ok=True)
+        path = os.path.join(RESULTS, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{revision}.json")
+        with open(path, "w") as f:
+            json.dump({"revision": revision, "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "settings": vars(args), "results": results}, f, indent=2)
+        print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
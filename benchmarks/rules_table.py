@@ -0,0 +1,49 @@
+# Classification cost of the compiled rule table as the number of intents grows
+#
+#   python benchmarks/rules_table.py
+import json
+import os
+import random
+import timeit
+
+import function_app
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def synthetic_rules(base, count, rng):
+    spec = json.loads(json.dumps(base))
+    for i in range(count):
+        words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 10))) for _ in range(5)]
+        spec["intents"].append({"name": f"intent{i}", "where": "message", "days": "weekday",
+                                "priority": rng.randint(1, 100), "keywords": words, "template": "help"})
+    return spec
+
+
+def main():
+    rules = function_app.load("bot.rules")
+    rng = random.Random(7)
+    with open(os.path.join(HERE, "..", "bot", "rules.json")) as f:
+        base = json.load(f)
+    vocabulary = ["please", "help", "my", "laptop", "today", "again", "the", "screen", "vpn"]
+    messages = {words: " ".join(rng.choice(vocabulary) for _ in range(words)) for words in (10, 100, 400)}
+
+    number = 2000
+    print(f"{'intents':>8}{'compile':>12}" + "".join(f"{f'{words} words':>14}" for words in messages))
+    for count in (0, 100, 300, 1000):
+        spec = synthetic_rules(base, count, rng)
+        compile_ms = timeit.timeit(lambda: rules.RuleTable(spec), number=5) / 5 * 1000
+        table = rules.RuleTable(spec)
+        line = f"{len(spec['intents']):>8}{compile_ms:>9.2f} ms"
+        for text in messages.values():
+            us = timeit.timeit(lambda: table.match(text, False, False), number=number) / number * 1e6
+            line += f"{us:>11.2f} us"
+        print(line)
+
+    rules.table()
+    us = timeit.timeit(rules.table, number=100000) / 100000 * 1e6
+    print(f"\nrules.table() per event between reload checks: {us:.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Local stand-in for the Slack Web API, used by the benchmark scripts
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOT_USER_ID = "UBOTSTUB"
+
+
+class SlackStub:
+    # Answers every /api/<method> call with ok=true after `latency` seconds and counts the calls.
+    # Set error_status (e.g. 503) to make every call fail like a degraded Slack API, or
+    # error_rate to fail that fraction of the calls at random.
+
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = None
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                method = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+                with stub._lock:
+                    stub.calls[method] += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status = 200
+                if stub.error_status or (stub.error_rate and random.random() < stub.error_rate):
+                    status = stub.error_status or 503
+                body = {"ok": status == 200}
+                if status != 200:
+                    body["error"] = "service_unavailable"
+                elif method == "auth.test":
+                    body["user_id"] = BOT_USER_ID
+                elif method == "chat.postMessage":
+                    body["ts"] = f"{time.time():.6f}"
+                elif method == "conversations.replies":  # Every thread is one the bot answered
+                    body["messages"] = [{"user": "U0STUB", "ts": "1"}, {"user": BOT_USER_ID, "ts": "2"}]
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST  # conversations.replies is a GET, its arguments are in the query string
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 1024
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
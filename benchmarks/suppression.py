@@ -0,0 +1,77 @@
+# Replays an incident burst (many users reporting the same outage, each with a few messages in a row)
+# against the local Slack stub and reports the replies posted with and without the suppression windows,
+# plus the cost of the check and the keys kept when far more users write than SLACK_SUPPRESS_MAX_KEYS.
+#
+#   python benchmarks/suppression.py --users 40 --messages 3
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import timeit
+import warnings
+
+import function_app
+from slack_stub import SlackStub
+
+BURST = ["vpn not working", "locked out", "can't login", "still locked", "is login broken for everyone?"]
+
+
+def requests_for(users, messages):
+    requests = []
+    for message in range(messages):
+        for user in range(users):
+            body = {
+                "type": "event_callback", "event_id": f"EvSUP{time.perf_counter_ns()}",
+                "event": {"type": "message", "channel": "C0INCIDENT", "user": f"U{user:05d}",
+                          "ts": f"1700000000.{message * users + user:06d}", "text": BURST[message % len(BURST)]},
+            }
+            requests.append(function_app.make_request(json.dumps(body).encode()))
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=3, help="messages each user sends in a row")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="The top-level `text` argument is missing")
+    logging.disable(logging.ERROR)
+
+    stub = SlackStub().start()
+    os.environ["SLACK_API_URL"] = stub.url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ["SLACK_OUTBOX_DB"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    os.environ["SLACK_SUPPRESS_USER_WINDOW"] = "600"
+    os.environ["SLACK_SUPPRESS_CHANNEL_WINDOW"] = "300"
+    bot = function_app.load("bot")
+    bot.is_weekend = lambda channel=None: False
+    suppression = bot.suppression
+
+    events = args.users * args.messages
+    print(f"{args.users} users x {args.messages} messages in one channel")
+    for label, on in (("suppression off", False), ("suppression on", True)):
+        suppression._user.width = suppression._user.window / suppression.BUCKETS if on else 0.0
+        suppression._channel.width = suppression._channel.window / suppression.BUCKETS if on else 0.0
+        stub.reset()
+        for req in requests_for(args.users, args.messages):
+            bot.main(req)
+        posted = stub.calls["chat.postMessage"]
+        print(f"{label:<18}{posted:>5} replies posted for {events} messages")
+    print(f"suppressed: {suppression.metrics()}")
+    stub.stop()
+
+    # Cost of the check itself, and memory staying bounded however many users write
+    window = suppression.SlidingWindow(600, 1, max_keys=10000)
+    now = time.time()
+    number = 200000
+    us = timeit.timeit(lambda: (window.full(("U1", "lock"), now), window.add(("U1", "lock"), now)),
+                       number=number) / number * 1e6
+    for user in range(100000):
+        window.add((f"U{user}", "lock"), now + user * 0.01)
+    print(f"\ncheck + add {us:.2f} us, keys kept after 100000 users: {len(window)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Time and allocations per reply: prebuilt templates vs. the nested dict literals main used to build
+#
+#   python benchmarks/templates.py
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import templates  # noqa: E402
+
+
+def inline_builder(template):
+    # Compile a function that builds the payload from a dict literal, like the old inline code did
+    blocks = json.loads(template.blocks)
+    return eval(f"lambda channel, ts: {{'channel': channel, 'thread_ts': ts, 'blocks': {blocks!r}}}")
+
+
+def allocated(fn):
+    # Peak memory allocated while producing one reply body
+    fn()  # warm up caches so only the per-reply work is traced
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - before
+
+
+def main():
+    number = 20000
+    print(f"{'reply':<10}{'inline':>12}{'template':>12}{'inline alloc':>15}{'template alloc':>17}")
+    for name, template in templates.TEMPLATES.items():
+        if template.blocks is None:
+            continue
+        build = inline_builder(template)
+
+        # Both include the json.dumps the SDK does on the request body
+        def old():
+            return json.dumps(build("C0123456", "1700000000.000100"))
+
+        def new():
+            return json.dumps(template.render("C0123456", "1700000000.000100"))
+
+        old_us = timeit.timeit(old, number=number) / number * 1e6
+        new_us = timeit.timeit(new, number=number) / number * 1e6
+        print(f"{name:<10}{old_us:>9.2f} us{new_us:>9.2f} us{allocated(old):>13.0f} B{allocated(new):>15.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,165 @@
 import azure.functions as func
 import logging
 import json
-from slack_sdk import WebClient
-import os
-import datetime
 
-# Define the lock and password keywords duo
-lock_keywords = ['locked', 'unlock', 'blocked','locking','lock','login', 'connect','vpn']
-password_keywords = ['password', 'expired','credentials']
-duo_kewords = ['duo','2fa']
+from . import (analytics, business_hours, classifier, dedup, dispatcher, gate, interactions, profiling, rules,
+               suppression, threads, timing)
+from .outbox import outbox
+from .slack_client import get_client, team_key
 
-def is_weekend():
-    # Get the current day of the week (0=Monday, 6=Sunday)
-    today = datetime.datetime.today().weekday()
-    # Check if it's Saturday (5) or Sunday (6)
-    return today >= 5  # True or False depending on the day
+def is_weekend(channel=None):
+    # Whether it is outside working time for the channel's office: weekends, holidays and after hours
+    # in its time zone (bot/calendar.json). Evaluated once per event and passed on from there.
+    return business_hours.off_hours(channel)
+
+def classify_intent(event, bot_id, weekend=None):
+    # Which reply a user's message event gets: 'bot' for our own messages, None when there is nothing to do.
+    # The intents, their keywords and when they apply come from the rules file (bot/rules.json).
+    if event.get('user') == bot_id:  # If bot id is equal to bot id
+        return 'bot'
+    if weekend is None:
+        weekend = is_weekend(event.get('channel'))
+    thread = bool(event.get('thread_ts'))  # Thread replies and new messages have their own rules
+    # With SLACK_CLASSIFIER_MODEL set, a trained model chooses between the keyword intents
+    classify = classifier.predict if classifier.MODEL_PATH else None
+    return rules.table().match(event.get('text') or '', thread, weekend, classify)
+
+def build_actions(intent, event):
+    # The (method, kwargs) Slack calls that make up the reply, built from the prebuilt templates
+    table = rules.table()
+    rule = table.rule(intent)
+    if rule is None:  # The rules were reloaded without this intent in between
+        return []
+    channel_id = event.get('channel')
+    ts = event.get('ts')
+    actions = []
+    if rule.reaction:
+        # React on the thread's first message, e.g. to mark it as resolved
+        actions.append(("reactions_add", {"channel": channel_id, "timestamp": event.get('thread_ts') or ts,
+                                          "name": rule.reaction}))
+    actions.append(("chat_postMessage", table.templates[rule.template].render(channel_id, ts)))
+    return actions
+
+def send(client, actions, team=None):
+    # Run the Slack calls now, or hand them to the background dispatcher in ack-first mode.
+    # With the outbox on, the reply is stored first and retried from there if Slack fails.
+    if outbox is not None:
+        outbox.send(client, actions, inline=not dispatcher.ACK_FIRST, team=team)
+    elif dispatcher.ACK_FIRST:
+        dispatcher.submit(client, actions)
+    else:
+        dispatcher.run_actions(client, actions)
+    return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
+
+def acknowledge(body, timings):
+    # A click on a button of a reply: answer Slack at once and run the click's follow-up in the background
+    try:
+        with timings.stage("parse"):
+            clicks = interactions.clicks(interactions.parse(body))
+    except ValueError:
+        return func.HttpResponse("Invalid interaction payload", status_code=400)
+    if clicks:
+        timings.set(outcome='interaction', action=clicks[0].action_id, channel=clicks[0].channel)
+        dispatcher.defer(interactions.follow_up, clicks)
+    else:
+        timings.set(outcome='interaction')
+    return func.HttpResponse(status_code=200)
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
+    # Time the stages of a sample of the invocations and report them with the branch taken,
+    # and count every invocation for the analytics. With profiling set up some run under cProfile.
+    timings = timing.start()
+    response = None
+    try:
+        if profiling.ENABLED:
+            response = profiling.profile(handle, req, timings)
+        else:
+            response = handle(req, timings)
+        return response
+    finally:
+        if response is None:
+            timings.set(outcome='error')
+        timings.emit(status=response.status_code if response is not None else 500)
+        analytics.record(timings.dimensions)
 
+def handle(req, timings):
+    # The checks and the decision are shared with bot_async, only the Slack calls differ
+    incoming = receive(req, timings)
+    if isinstance(incoming, func.HttpResponse):
+        return incoming
+    # Reuse the client and bot identity cached for the event's workspace instead of calling auth.test every time
+    slack = get_client(incoming.team)
+    with timings.stage("identity"):
+        bot_id = slack.bot_id()
+    if incoming.unverified:
+        with timings.stage("thread"):
+            answered = slack.answered_thread(incoming.event.get('channel'), incoming.event.get('thread_ts'))
+        if not answered:
+            return not_bot_thread(timings)
+    response, intent, actions = decide(incoming, bot_id, timings)
+    if response is not None:
+        return response
     try:
-        req_body = req.get_json()
+        return send(slack.client, actions, incoming.team)
+    except Exception as e:
+        return send_failed(intent, e)
+
+class Incoming:
+    # A user's message that got past the checks of receive and needs the workspace's Slack client
+
+    __slots__ = ("event", "team", "weekend", "unverified")
+
+    def __init__(self, event, team, weekend, unverified=False):
+        self.event = event
+        self.team = team
+        self.weekend = weekend
+        self.unverified = unverified  # A thread reply still to be checked with Slack, see receive
+
+def not_bot_thread(timings):
+    timings.set(outcome='not_bot_thread')
+    return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
+
+def receive(req, timings):
+    # Everything that can be answered without Slack: returns the response, or an Incoming message
+    if outbox is not None:
+        outbox.resume()
+
+    # Slack redelivered an event we already got, acknowledge it without reading the body
+    if dedup.is_retry(req):
+        logging.info(f"Ignoring Slack retry #{req.headers.get('X-Slack-Retry-Num')}")
+        timings.set(outcome='retry')
+        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
+
+    with timings.stage("gate"):
+        body = req.get_body()
+        verified = gate.verify(req, body)
+        interaction = verified and interactions.is_payload(body)
+        noise = gate.noise(body) if verified and not interaction else None
+    if not verified:
+        logging.warning("Rejecting a request without a valid Slack signature")
+        timings.set(outcome='bad_signature')
+        return func.HttpResponse("Invalid request signature", status_code=401)
+    if interaction:
+        # Button clicks come as a form-encoded payload rather than an event
+        return acknowledge(body, timings)
+    if noise:
+        # Edits, deletions, bot messages and other events the bot never answers, no parsing needed
+        timings.set(outcome='filtered', reason=noise)
+        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
+
+    try:
+        with timings.stage("parse"):
+            req_body = req.get_json()
         event_type = req_body.get('event', {}).get('type')
     except ValueError:
         return func.HttpResponse("Invalid JSON in request body", status_code=400)
 
-    slack_token = os.environ.get("SLACK_BOT_TOKEN")  # Slack token
-    client = WebClient(slack_token)  # Create a WebClient object
-    bot_id = client.api_call("auth.test")['user_id']  # Get the ID of our bot
-
+    # Each event is processed once, a duplicate delivery never reaches the Slack API
+    event_key = dedup.event_key(req_body)
+    if event_key and dedup.seen(event_key):
+        logging.info(f"Ignoring duplicate event {event_key}")
+        timings.set(outcome='duplicate')
+        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
 
     if event_type == 'url_verification':
         # Respond to the URL verification challenge
@@ -38,482 +170,19 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             return func.HttpResponse(json.dumps(response_data), status_code=200, mimetype="application/json")
 
     elif event_type == 'message':
-        # Extract message details from the event we are listening to
-        channel_id = req_body.get('event', {}).get('channel')
-        user_id = req_body.get('event', {}).get('user')
-        ts = req_body.get('event', {}).get('ts')
-        thread_ts = req_body.get('event', {}).get('thread_ts')
-        message_text = req_body.get('event', {}).get('text')
+        event = req_body.get('event', {})
+        timings.set(channel=event.get('channel'))
 
         # This code is sending the message and reacting only to the user message
-        if  user_id:  # If user id field is not empty
-            if bot_id == user_id:  # If bot id is equal to bot id
-                logging.info("Ignoring message from bot itself.")
-                return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
-
-            elif not thread_ts:  # If it is not a thread message, avoiding repeated messages in the thread
-                if not is_weekend():  # If it is not the weekend
-                    # Keyword check for lock and password issues
-                    if any(keyword in message_text.lower() for keyword in lock_keywords):
-                        # Construct the unlock message payload
-                        message_payload = {
-                            "channel": channel_id,
-                            "thread_ts": ts,
-                           "blocks": [
-                                {
-                                    "type": "divider"
-                                },
-                                {
-                                    "type": "section",
-                                    "text": {
-                                        "type": "mrkdwn",
-                                        "text": "Hi, note that you can unlock yourself with SSPR"
-                                    },
-                                    "accessory": {
-                                        "type": "button",
-                                        "text": {
-                                            "type": "plain_text",
-                                            "text": "Unlock account",
-                                            "emoji": True
-                                        },
-                                        "value": "click_me_123",
-                                        "url": "https://confluence.infobip.com/display/CWT/Self+service+password+reset+-+how+to+unlock+your+account",
-                                        "action_id": "button-action"
-                                    }
-                                },
-                                {
-                                    "type": "divider"
-                                },
-                                {
-                                    "type": "section",
-                                    "text": {
-                                        "type": "mrkdwn",
-                                        "text": "To access the SSPR you must be enrolled"
-                                    },
-                                    "accessory": {
-                                        "type": "button",
-                                        "text": {
-                                            "type": "plain_text",
-                                            "text": "Enroll to SSPR",
-                                            "emoji": True
-                                        },
-                                        "value": "click_me_123",
-                                        "url": "https://confluence.infobip.com/display/CWT/Self+service+password+reset+-+add+additional+sign-in+method",
-                                        "action_id": "button-action"
-                                    }
-                                },
-                                {
-                                    "type": "divider"
-                                },
-                                {
-                                    "type": "rich_text",
-                                    "elements": [
-                                        {
-                                            "type": "rich_text_section",
-                                            "elements": [
-                                                {
-                                                    "type": "text",
-                                                    "text": "Write "
-                                                },
-                                                {
-                                                    "type": "text",
-                                                    "text": "THX ",
-                                                    "style": {
-                                                        "bold": True
-                                                    }
-                                                },
-                                                {
-                                                    "type": "text",
-                                                    "text": "if you resolved the issue.\nWrite "
-                                                },
-                                                {
-                                                    "type": "text",
-                                                    "text": "HELP",
-                                                    "style": {
-                                                        "bold": True
-                                                    }
-                                                },
-                                                {
-                                                    "type": "text",
-                                                    "text": " if you require additional assistance."
-                                                }
-                                            ]
-                                        }
-                                    ]
-                                }
-                            ]
-                        }
-                        
-                        # Send the unlock message
-                        client.chat_postMessage(**message_payload)
-                        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
-
-                    elif any(keyword in message_text.lower() for keyword in password_keywords):
-                        # Construct the password expired message payload
-                        message_payload = {
-                            "channel": channel_id,
-                            "thread_ts": ts,
-                            "blocks": [
-                                    {
-                                        "type": "divider"
-                                    },
-                                    {
-                                        "type": "section",
-                                        "text": {
-                                            "type": "mrkdwn",
-                                            "text": "Password has expired ?"
-                                        },
-                                        "accessory": {
-                                            "type": "button",
-                                            "text": {
-                                                "type": "plain_text",
-                                                "text": "Reset password",
-                                                "emoji": True
-                                            },
-                                            "value": "click_me_123",
-                                            "url": "https://account.activedirectory.windowsazure.com/ChangePassword.aspx",
-                                            "action_id": "button-action"
-                                        }
-                                    },
-                                    {
-                                        "type": "divider"
-                                    },
-                                    {
-                                        "type": "rich_text",
-                                        "elements": [
-                                            {
-                                                "type": "rich_text_section",
-                                                "elements": [
-                                                    {
-                                                        "type": "text",
-                                                        "text": "Write "
-                                                    },
-                                                    {
-                                                        "type": "text",
-                                                        "text": "THX ",
-                                                        "style": {
-                                                            "bold": True
-                                                        }
-                                                    },
-                                                    {
-                                                        "type": "text",
-                                                        "text": "if you resolved the issue.\nWrite "
-                                                    },
-                                                    {
-                                                        "type": "text",
-                                                        "text": "HELP",
-                                                        "style": {
-                                                            "bold": True
-                                                        }
-                                                    },
-                                                    {
-                                                        "type": "text",
-                                                        "text": " if you require additional assistance."
-                                                    }
-                                                ]
-                                            }
-                                        ]
-                                    }
-                                ]
-                            
-                        }
-                        # Send the password expired message
-                        client.chat_postMessage(**message_payload)
-                        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
-                    
-                    elif any(keyword in message_text.lower() for keyword in duo_kewords):
-                        # Construct the password expired message payload
-                        message_payload = {
-                            "channel": channel_id,
-                            "thread_ts": ts,
-                            "blocks": [
-                                            {
-                                                "type": "divider"
-                                            },
-                                            {
-                                                "type": "section",
-                                                "text": {
-                                                    "type": "mrkdwn",
-                                                    "text": "If you need to re-enroll to DUO 2FA raise the ticket "
-                                                },
-                                                "accessory": {
-                                                    "type": "button",
-                                                    "text": {
-                                                        "type": "plain_text",
-                                                        "text": "Here",
-                                                        "emoji": True
-                                                    },
-                                                    "value": "click_me_123",
-                                                    "url": "https://jira.infobip.com/plugins/servlet/theme/portal/3/create/114",
-                                                    "action_id": "button-action"
-                                                }
-                                            },
-                                            {
-                                                "type": "divider"
-                                            },
-                                            {
-                                                "type": "rich_text",
-                                                "elements": [
-                                                    {
-                                                        "type": "rich_text_section",
-                                                        "elements": [
-                                                            {
-                                                                "type": "text",
-                                                                "text": "Write "
-                                                            },
-                                                            {
-                                                                "type": "text",
-                                                                "text": "THX ",
-                                                                "style": {
-                                                                    "bold": True
-                                                                }
-                                                            },
-                                                            {
-                                                                "type": "text",
-                                                                "text": "if you resolved the issue.\nWrite "
-                                                            },
-                                                            {
-                                                                "type": "text",
-                                                                "text": "HELP",
-                                                                "style": {
-                                                                    "bold": True
-                                                                }
-                                                            },
-                                                            {
-                                                                "type": "text",
-                                                                "text": " if you require additional assistance."
-                                                            }
-                                                        ]
-                                                    }
-                                                ]
-                                            }
-                                        ]
-                            
-                        }
-                        client.chat_postMessage(**message_payload)
-                        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
-                    
-                else:
-                    # Send message to the Slack channel/thread during weekends
-                    message_payload = {
-                        "channel": channel_id,
-                        "thread_ts": ts,
-                        	  "blocks": [
-                                        {
-                                            "type": "divider"
-                                        },
-                                        {
-                                            "type": "section",
-                                            "text": {
-                                                "type": "mrkdwn",
-                                                "text": "Password expired?"
-                                            },
-                                            "accessory": {
-                                                "type": "button",
-                                                "text": {
-                                                    "type": "plain_text",
-                                                    "text": "Reset password",
-                                                    "emoji": True
-                                                },
-                                                "value": "click_me_123",
-                                                "url": "https://account.activedirectory.windowsazure.com/ChangePassword.aspx",
-                                                "action_id": "button-action"
-                                            }
-                                        },
-                                        {
-                                            "type": "divider"
-                                        },
-                                        {
-                                            "type": "section",
-                                            "text": {
-                                                "type": "mrkdwn",
-                                                "text": "Unlock yourself with SSPR"
-                                            },
-                                            "accessory": {
-                                                "type": "button",
-                                                "text": {
-                                                    "type": "plain_text",
-                                                    "text": "Unlock account",
-                                                    "emoji": True
-                                                },
-                                                "value": "click_me_123",
-                                                "url": "https://confluence.infobip.com/display/CWT/Self+service+password+reset+-+how+to+unlock+your+account",
-                                                "action_id": "button-action"
-                                            }
-                                        },
-                                        {
-                                            "type": "divider"
-                                        },
-                                        {
-                                            "type": "section",
-                                            "text": {
-                                                "type": "mrkdwn",
-                                                "text": "For non-urgent problems, please open a ticket on our Corporate IT Service Desk"
-                                            },
-                                            "accessory": {
-                                                "type": "button",
-                                                "text": {
-                                                    "type": "plain_text",
-                                                    "text": "Service desk",
-                                                    "emoji": True
-                                                },
-                                                "value": "click_me_123",
-                                                "url": "https://jira.infobip.com/servicedesk/customer/portal/3",
-                                                "action_id": "button-action"
-                                            }
-                                        },
-                                        {
-                                            "type": "divider"
-                                        },
-                                        {
-                                            "type": "section",
-                                            "text": {
-                                                "type": "plain_text",
-                                                "text": "If this is urgent, please write 'urgent' in this thread",
-                                                "emoji": True
-                                            }
-                                        },
-                                        {
-                                            "type": "divider"
-                                        }
-                                    ]
-                    }
-                    # Send message to the Slack channel/thread
-                    client.chat_postMessage(**message_payload)
-                    return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
-                
-            else:# If it is the weekend 
-                if is_weekend() and 'urgent' in message_text.lower():  # Check if someone typed 'urgent' regardless of case
-                    # Construct the urgent text payload
-                    urgent_text_payload = {
-                        "channel": channel_id,
-                        "thread_ts": ts,
-                        "blocks": [
-                            {
-                                "type": "rich_text",
-                                "elements": [
-                                    {
-                                        "type": "rich_text_section",
-                                        "elements": [
-                                            {
-                                                "type": "text",
-                                                "text": "What is an emergency?",
-                                                "style": {
-                                                    "bold": True
-                                                }
-                                            },
-                                            {
-                                                "type": "text",
-                                                "text": "\n"
-                                            }
-                                        ]
-                                    },
-                                    {
-                                        "type": "rich_text_list",
-                                        "style": "bullet",
-                                        "indent": 0,
-                                        "border": 0,
-                                        "elements": [
-                                            {
-                                                "type": "rich_text_section",
-                                                "elements": [
-                                                    {
-                                                        "type": "text",
-                                                        "text": "Urgent domain account problem (locked, expired, password reset)"
-                                                    }
-                                                ]
-                                            },
-                                            {
-                                                "type": "rich_text_section",
-                                                "elements": [
-                                                    {
-                                                        "type": "text",
-                                                        "text": "The device is stolen (mobile phone, laptop)"
-                                                    }
-                                                ]
-                                            },
-                                            {
-                                                "type": "rich_text_section",
-                                                "elements": [
-                                                    {
-                                                        "type": "text",
-                                                        "text": "BitLocker encryption problems"
-                                                    }
-                                                ]
-                                            },
-                                            {
-                                                "type": "rich_text_section",
-                                                "elements": [
-                                                    {
-                                                        "type": "text",
-                                                        "text": "DUO problem"
-                                                    }
-                                                ]
-                                            }
-                                        ]
-                                    },
-                                    {
-                                        "type": "rich_text_section",
-                                        "elements": [
-                                            {
-                                                "type": "text",
-                                                "text": "On-Call Schedule information can be found "
-                                            },
-                                            {
-                                                "type": "link",
-                                                "url": "https://confluence.infobip.com/display/RCIS/RA+CIS+-+Weekend+On-Call+duty",
-                                                "text": "HERE"
-                                            },
-                                            {
-                                                "type": "text",
-                                                "text": "\nOn-Duty phone number:\n"
-                                            },
-                                            {
-                                                "type": "link",
-                                                "url": "tel:+385993038199",
-                                                "text": "+385 99 3038 199"
-                                            }
-                                        ]
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                    # Send the urgent text payload
-                    client.chat_postMessage(**urgent_text_payload)
-                    
-                    
-                    
-                    
-                    
-                elif message_text.lower() == 'thx':
-                    try:
-                        client.reactions_add(channel=channel_id, timestamp=thread_ts, name="checkgreens")
-                        thx_response = {
-						"channel": channel_id,
-						"thread_ts": ts,
-						"text": "Resolved"}
-                        client.chat_postMessage(**thx_response)
-                        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
-                    except Exception as e:
-                        if 'already_reacted' in str(e):  # Check if the error is 'already_reacted'
-                            return func.HttpResponse("The reaction has already been added to this message.", status_code=200)
-                        else:
-                            logging.error(f"Error occurred while processing 'thx' message: {e}")
-                            return func.HttpResponse("Error occurred while processing 'thx' message", status_code=500)
-  
-                
-                elif message_text.lower() == 'help':
-                     # Respond to the user
-                    help_response = {
-                            "channel": channel_id,
-                            "thread_ts": ts,
-                            "text": "Soon an IT agent will assist you. Thank you for your patience."
-                        }
-                    client.chat_postMessage(**help_response)
-                    return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')    
-            
-        
+        if event.get('user'):  # If user id field is not empty
+            weekend = is_weekend(event.get('channel'))  # One clock reading per event
+            # A reply in a thread this instance does not know may still be in a bot thread, answered on another
+            # instance, before a restart or before this deploy. Replies that get no answer anyway are dropped
+            # here, the others (THX, HELP, a weekend "urgent") are checked with Slack first.
+            unverified = not threads.known(event)
+            if unverified and classify_intent(event, None, weekend) is None:
+                return not_bot_thread(timings)
+            return Incoming(event, team_key(req_body), weekend, unverified)
 
         else:
             logging.warning("User ID is not provided in the message event.")
@@ -525,4 +194,48 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         pass
 
     # If the event type is not recognized or no action is taken
-    return func.HttpResponse("Event handled successfully", status_code=200)
\ No newline at end of file
+    return func.HttpResponse("Event handled successfully", status_code=200)
+
+def decide(incoming, bot_id, timings):
+    # The reply to an Incoming message once the bot identity is known. Returns (response, intent, actions):
+    # the response when there is nothing to send, otherwise the intent and the Slack calls of the reply.
+    event, weekend = incoming.event, incoming.weekend
+    with timings.stage("classify"):
+        intent = classify_intent(event, bot_id, weekend)
+    timings.set(intent=intent, weekend=weekend)
+    actions = []
+    if intent is not None and intent != 'bot':
+        if threads.already_handled(event, intent):
+            # E.g. a second THX in a thread that is already resolved
+            logging.info(f"Ignoring repeated '{intent}' in thread {event.get('thread_ts')}")
+            timings.set(outcome='repeat')
+            return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json'), intent, []
+        suppressed_by = suppression.check(event, intent)
+        if suppressed_by:
+            # The same answer went to this user / channel moments ago. The thread is still remembered,
+            # so a THX, HELP or weekend "urgent" written in it gets its answer.
+            logging.info(f"Suppressing '{intent}' reply, {suppressed_by} window is full")
+            threads.record(event, intent)
+            timings.set(outcome='suppressed', suppressed_by=suppressed_by)
+            return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json'), intent, []
+        with timings.stage("payload"):
+            actions = build_actions(intent, event)
+        if actions:
+            threads.record(event, intent)
+
+    timings.set(outcome='replied' if actions else 'ignored')
+    if intent == 'bot':
+        logging.info("Ignoring message from bot itself.")
+        return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json'), intent, []
+    if not actions:
+        return func.HttpResponse("Event handled successfully", status_code=200), intent, []
+    return None, intent, actions
+
+def send_failed(intent, error):
+    # The response when sending a reply raised. For 'thx' the reaction may already be there.
+    if intent != 'thx':
+        raise error
+    if 'already_reacted' in str(error):  # Check if the error is 'already_reacted'
+        return func.HttpResponse("The reaction has already been added to this message.", status_code=200)
+    logging.error(f"Error occurred while processing 'thx' message: {error}")
+    return func.HttpResponse("Error occurred while processing 'thx' message", status_code=500)
@@ -0,0 +1,128 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Counts of the events the bot handled per hour, intent, channel and outcome. They are kept in
+# memory and appended to one file per day every FLUSH_INTERVAL seconds, which the stats function
+# reads back (only the part written since its last query) to answer with aggregates.
+ANALYTICS_DIR = os.environ.get("SLACK_ANALYTICS_DIR", os.path.join(tempfile.gettempdir(), "slack_analytics"))
+ENABLED = bool(ANALYTICS_DIR)
+FLUSH_INTERVAL = float(os.environ.get("SLACK_ANALYTICS_FLUSH_INTERVAL", "60"))
+# Distinct counters kept between two flushes, further channels are counted as "other"
+MAX_KEYS = int(os.environ.get("SLACK_ANALYTICS_MAX_KEYS", "5000"))
+
+FIELDS = ("hour", "intent", "channel", "outcome")
+
+_counts = Counter()
+_lock = threading.Lock()
+_flusher = None
+
+
+def record(dimensions):
+    # Count one invocation from the dimensions its handler set (intent, channel, outcome)
+    if not ENABLED:
+        return
+    key = (int(time.time() // 3600), dimensions.get("intent"), dimensions.get("channel"),
+           dimensions.get("outcome", "ignored"))
+    with _lock:
+        if key not in _counts and len(_counts) >= MAX_KEYS:
+            key = key[:2] + ("other",) + key[3:]
+        _counts[key] += 1
+    if _flusher is None:
+        _start_flusher()
+
+
+def _path(day):
+    return os.path.join(ANALYTICS_DIR, f"analytics-{day:%Y%m%d}.jsonl")
+
+
+def flush():
+    # Append the counts gathered since the last flush to today's file, in a single write
+    global _counts
+    with _lock:
+        counts, _counts = _counts, Counter()
+    if not counts:
+        return
+    lines = []
+    for (hour, intent, channel, outcome), count in counts.items():
+        start = datetime.datetime.fromtimestamp(hour * 3600, datetime.timezone.utc)
+        lines.append(json.dumps({"hour": f"{start:%Y-%m-%dT%H}", "intent": intent, "channel": channel,
+                                 "outcome": outcome, "count": count}) + "\n")
+    os.makedirs(ANALYTICS_DIR, exist_ok=True)
+    with open(_path(datetime.datetime.now(datetime.timezone.utc)), "a") as f:
+        f.write("".join(lines))
+
+
+def _flush_forever():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError as e:
+            logging.error(f"Error occurred while writing the analytics counters: {e}")
+
+
+def _start_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, name="slack-analytics", daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+
+class _FileTotals:
+    # Counts read so far from one day's file and the offset to continue reading from
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = Counter()
+
+    def update(self, path):
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # A line still being written by another worker is read next time
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            self.counts[tuple(entry[field] for field in FIELDS)] += entry["count"]
+        self.offset += end
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def query(days=7, by=("intent", "outcome")):
+    # Aggregated counts of the last `days` days (UTC), grouped by the `by` fields
+    flush()  # What this worker counted so far is included as well
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    group = [FIELDS.index(field) for field in by]
+    totals = Counter()
+    replied = Counter()
+    with _files_lock:
+        paths = [_path(today - datetime.timedelta(days=back)) for back in range(days)]
+        for path in [path for path in _files if path not in paths]:
+            del _files[path]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            file_totals = _files.setdefault(path, _FileTotals())
+            file_totals.update(path)
+            for key, count in file_totals.counts.items():
+                totals[tuple(key[i] for i in group)] += count
+                if key[3] == "replied":
+                    replied[key[1]] += count
+    rows = [dict(zip(by, key), count=count) for key, count in totals.most_common()]
+    # How many of the threads that ended with THX or HELP were resolved (THX) rather than escalated (HELP)
+    closed = replied["thx"] + replied["help"]
+    resolution = {"thx": replied["thx"], "help": replied["help"],
+                  "thx_share": round(replied["thx"] / closed, 3) if closed else None}
+    return {"days": days, "by": list(by), "total": sum(totals.values()), "rows": rows,
+            "replied": dict(replied), "resolution": resolution}
@@ -0,0 +1,147 @@
+import bisect
+import datetime
+import json
+import os
+import threading
+import time
+
+# When the help desk is working, per office: working days, opening hours, holidays and on-call
+# windows (which are off hours) in the office's time zone (bot/calendar.json). It is expanded once
+# into a sorted list of the UTC instants where the office closes and opens again, so whether a
+# moment is off hours is a binary search however many years of holidays the calendar holds.
+CALENDAR_PATH = os.environ.get("SLACK_CALENDAR_PATH", os.path.join(os.path.dirname(__file__), "calendar.json"))
+# Years after the current one the calendar is expanded for, it is expanded again when the clock gets there
+YEARS = int(os.environ.get("SLACK_CALENDAR_YEARS", "1"))
+
+_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def _time(text):
+    hour, minute = text.split(":")
+    return datetime.time(int(hour), int(minute))
+
+
+def _merge(intervals):
+    # The union of (start, end) intervals, sorted and without overlaps
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and merged[-1][1] >= start:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class Schedule:
+    # One office's off-hours as alternating close / open instants (epoch seconds) from first_day to the end of last_year
+
+    def __init__(self, spec, first_day, last_year):
+        timezone = spec.get("timezone")
+        if timezone:
+            from zoneinfo import ZoneInfo
+            self.tz = ZoneInfo(timezone)
+        else:
+            self.tz = None  # Server local time
+        workdays = {_DAYS.index(day) for day in spec.get("workdays", _DAYS[:5])}
+        hours = spec.get("hours")
+        opens, closes = (_time(hours["start"]), _time(hours["end"])) if hours else (None, None)
+        holidays, yearly = set(), set()
+        for day in spec.get("holidays", []):
+            if len(day) == 5:  # "MM-DD", every year
+                yearly.add((int(day[:2]), int(day[3:])))
+            else:
+                holidays.add(datetime.date.fromisoformat(day))
+
+        # Closed intervals in local time first, merged, so only the instants the office opens or closes
+        # are converted to epoch seconds (a handful per week) rather than every midnight
+        closed = []
+        day, last_day = first_day, datetime.date(last_year + 1, 1, 1)
+        while day < last_day:
+            midnight = datetime.datetime.combine(day, datetime.time())
+            next_midnight = midnight + datetime.timedelta(days=1)
+            if day.weekday() not in workdays or day in holidays or (day.month, day.day) in yearly:
+                self._close(closed, midnight, next_midnight)
+            elif hours:
+                self._close(closed, midnight, datetime.datetime.combine(day, opens))
+                self._close(closed, datetime.datetime.combine(day, closes), next_midnight)
+            day += datetime.timedelta(days=1)
+        closed = [(self._epoch(start), self._epoch(end)) for start, end in closed]
+
+        # During an on-call window only the on-call duty answers, so it is off hours even on a working day
+        # (e.g. a bridge day): the weekend replies with the on-call number and the "urgent" escalation apply
+        on_call = [(self._epoch(datetime.datetime.fromisoformat(window["start"])),
+                    self._epoch(datetime.datetime.fromisoformat(window["end"])))
+                   for window in spec.get("on_call", [])]
+        self.bounds = []
+        for start, end in _merge(closed + on_call):
+            self.bounds += [start, end]
+        self.start = self._epoch(datetime.datetime.combine(first_day, datetime.time()))
+        self.end = self._epoch(datetime.datetime.combine(last_day, datetime.time()))
+
+    @staticmethod
+    def _close(closed, start, end):
+        if start >= end:
+            return
+        if closed and closed[-1][1] >= start:  # Runs on from the previous interval, e.g. Friday evening into Saturday
+            closed[-1] = (closed[-1][0], max(closed[-1][1], end))
+        else:
+            closed.append((start, end))
+
+    def _epoch(self, moment):
+        # Epoch seconds of a local time in the office's time zone
+        if self.tz is None:
+            return time.mktime(moment.timetuple())
+        return moment.replace(tzinfo=self.tz).timestamp()
+
+    def covers(self, now):
+        return self.start <= now < self.end
+
+    def off_hours(self, now):
+        # Inside a closed interval when an odd number of boundaries lie at or before now
+        return bisect.bisect_right(self.bounds, now) % 2 == 1
+
+
+class Calendar:
+    # The schedule of every office and which office each channel belongs to
+
+    def __init__(self, spec, year):
+        self.spec = spec
+        # From the last day of the previous year, so every office's time zone is covered on January 1st
+        first_day = datetime.date(year, 1, 1) - datetime.timedelta(days=1)
+        self.offices = {name: Schedule(office, first_day, year + YEARS)
+                        for name, office in spec["offices"].items()}
+        self.channels = spec.get("channels", {})
+        self.default = self.offices[spec.get("default", "default")]
+
+    def schedule(self, channel):
+        office = self.channels.get(channel)
+        return self.offices[office] if office is not None else self.default
+
+
+_calendar = None
+_lock = threading.Lock()
+
+
+def _load(now):
+    global _calendar
+    with _lock:
+        calendar = _calendar
+        if calendar is None or not all(schedule.covers(now) for schedule in calendar.offices.values()):
+            if calendar is None:
+                with open(CALENDAR_PATH) as f:
+                    spec = json.load(f)
+            else:
+                spec = calendar.spec
+            _calendar = calendar = Calendar(spec, datetime.datetime.fromtimestamp(now).year)
+        return calendar
+
+
+def off_hours(channel=None, now=None):
+    # True outside the working time of the channel's office: weekends, holidays and after hours
+    if now is None:
+        now = time.time()
+    calendar = _calendar
+    schedule = calendar.schedule(channel) if calendar is not None else None
+    if schedule is None or not schedule.covers(now):
+        schedule = _load(now).schedule(channel)
+    return schedule.off_hours(now)
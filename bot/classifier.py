@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import zlib
+
+from .matcher import words
+
+# Optional model deciding between the keyword intents instead of the keywords themselves. It is a
+# softmax regression over hashed word 1-2 grams and character trigrams (TF-IDF weighted), stored as
+# a NumPy .npz file and trained with benchmarks/intent_classifier.py. When it is not confident
+# enough, or when the file or NumPy is missing, the keywords decide as before.
+MODEL_PATH = os.environ.get("SLACK_CLASSIFIER_MODEL")
+# Lowest probability at which the model's answer is taken over the keywords
+THRESHOLD = float(os.environ.get("SLACK_CLASSIFIER_THRESHOLD", "0.5"))
+# Hashed feature space of newly trained models
+DIMENSIONS = 2 ** 15
+
+
+def features(text, dimensions):
+    # Counts of the hashed features of text, as {index: count}. crc32 rather than hash(),
+    # which is salted per process and would not match the trained weights.
+    tokens = words(text)
+    grams = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    counts = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode()) % dimensions
+        counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+class Model:
+    # Weights (features x intents), bias and IDF of a trained model. Messages are scored in
+    # batches: their sparse feature rows gather the weight rows they use, summed per message.
+
+    def __init__(self, intents, weights, bias, idf):
+        import numpy as np
+
+        self.np = np
+        self.intents = [str(intent) for intent in intents]
+        self.labels = frozenset(self.intents)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.dimensions = self.weights.shape[0]
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["intents"], data["weights"], data["bias"], data["idf"])
+
+    def save(self, path):
+        self.np.savez_compressed(path, intents=self.np.array(self.intents), weights=self.weights,
+                                 bias=self.bias, idf=self.idf)
+
+    def sparse(self, texts):
+        # Feature rows of the messages as (row of each entry, feature index, TF-IDF value), L2 normalised
+        np = self.np
+        rows, indices, values = [], [], []
+        for row, text in enumerate(texts):
+            counts = features(text, self.dimensions)
+            rows += [row] * len(counts)
+            indices += counts.keys()
+            values += counts.values()
+        rows = np.array(rows, dtype=np.int64)
+        indices = np.array(indices, dtype=np.int64)
+        values = np.log1p(np.array(values, dtype=np.float32)) * self.idf[indices]
+        norms = np.bincount(rows, values * values, len(texts)).astype(np.float32)
+        values /= np.sqrt(norms[rows])
+        return rows, indices, values
+
+    def probabilities(self, texts):
+        # (messages x intents) probabilities
+        return self._probabilities(*self.sparse(texts), len(texts))
+
+    def _probabilities(self, rows, indices, values, count):
+        np = self.np
+        logits = np.tile(self.bias, (count, 1))
+        if len(rows):
+            contributions = self.weights[indices] * values[:, None]
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            logits[rows[starts]] += np.add.reduceat(contributions, starts)
+        logits -= logits.max(axis=1, keepdims=True)
+        scores = np.exp(logits)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, texts):
+        # [(intent, probability)] of each message
+        scores = self.probabilities(texts)
+        best = scores.argmax(axis=1)
+        return [(self.intents[i], float(scores[row, i])) for row, i in enumerate(best)]
+
+
+def train(texts, labels, dimensions=DIMENSIONS, epochs=300, rate=10.0, l2=1e-4):
+    # Fit a Model on labelled messages with full batch gradient descent
+    import numpy as np
+
+    intents = sorted(set(labels))
+    target = np.zeros((len(texts), len(intents)), dtype=np.float32)
+    target[np.arange(len(texts)), [intents.index(label) for label in labels]] = 1.0
+    document_frequency = np.zeros(dimensions, dtype=np.float32)
+    for text in texts:
+        document_frequency[list(features(text, dimensions))] += 1
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    model = Model(intents, np.zeros((dimensions, len(intents))), np.zeros(len(intents)), idf)
+    matrix = model.sparse(texts)
+    rows, indices, values = matrix
+    for _ in range(epochs):
+        error = (model._probabilities(*matrix, len(texts)) - target) / len(texts)
+        weighted = values[:, None] * error[rows]
+        gradient = np.stack([np.bincount(indices, weighted[:, k], dimensions) for k in range(len(intents))], axis=1)
+        model.weights -= rate * (gradient + l2 * model.weights)
+        model.bias -= rate * error.sum(axis=0)
+    return model
+
+
+_model = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def model():
+    # The model from SLACK_CLASSIFIER_MODEL, loaded on first use. None when it is not configured or cannot be loaded.
+    global _model, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                if MODEL_PATH:
+                    try:
+                        _model = Model.load(MODEL_PATH)
+                        logging.info(f"Loaded intent classifier {MODEL_PATH} ({', '.join(_model.intents)})")
+                    except (ImportError, OSError, KeyError, ValueError) as e:
+                        logging.error(f"Intent classifier disabled, {MODEL_PATH} could not be loaded: {e}")
+                _loaded = True
+    return _model
+
+
+def predict(text, intents):
+    # The model's choice among `intents` (or a label such as "none" meaning no reply), None when the
+    # model is off, was not trained on all of them or is not confident, and the keywords decide
+    current = model()
+    if current is None or not current.labels.issuperset(intents):
+        return None
+    intent, probability = current.predict([text])[0]
+    return intent if probability >= THRESHOLD else None
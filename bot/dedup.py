@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# How long (seconds) an event is remembered, Slack stops retrying after about an hour
+TTL = float(os.environ.get("SLACK_DEDUP_TTL", "3600"))
+MAX_SIZE = int(os.environ.get("SLACK_DEDUP_MAX_SIZE", "10000"))
+# Optional SQLite file shared by all function instances on the same host
+DB_PATH = os.environ.get("SLACK_DEDUP_DB")
+
+
+def event_key(req_body):
+    # Slack's event_id when present, otherwise channel + ts of the message
+    event_id = req_body.get('event_id')
+    if event_id:
+        return event_id
+    event = req_body.get('event', {})
+    if event.get('channel') and event.get('ts'):
+        return f"{event['channel']}:{event['ts']}"
+    return None
+
+
+class LRUCache:
+    # In-process set of recently seen keys, bounded by size and expiring after ttl seconds
+
+    def __init__(self, max_size=MAX_SIZE, ttl=TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, key):
+        # Return True if key was already recorded, otherwise record it and return False
+        now = time.monotonic()
+        with self._lock:
+            expires = self._items.get(key)
+            if expires is not None and expires > now:
+                return True
+            self._items[key] = now + self.ttl
+            self._items.move_to_end(key)
+            # Entries are kept in insertion order, so expired ones sit at the front
+            while self._items:
+                oldest_key, oldest_expires = next(iter(self._items.items()))
+                if len(self._items) <= self.max_size and oldest_expires > now:
+                    break
+                del self._items[oldest_key]
+            return False
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteCache:
+    # Same contract as LRUCache, backed by a local SQLite file so several workers share it
+
+    def __init__(self, path, ttl=TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS seen_events (key TEXT PRIMARY KEY, expires REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def seen(self, key):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT expires FROM seen_events WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now:
+                return True
+            conn.execute("INSERT OR REPLACE INTO seen_events (key, expires) VALUES (?, ?)", (key, now + self.ttl))
+            self._writes += 1
+            if self._writes % 1000 == 0:  # Purge expired rows now and then instead of on every event
+                conn.execute("DELETE FROM seen_events WHERE expires <= ?", (now,))
+            return False
+        finally:
+            conn.execute("COMMIT")
+
+
+_cache = SQLiteCache(DB_PATH) if DB_PATH else LRUCache()
+
+
+def seen(key):
+    # True if this event was already handled by this worker (or host, with the SQLite backend)
+    return _cache.seen(key)
+
+
+def is_retry(req):
+    # Slack marks redelivered events with X-Slack-Retry-Num, checked before the body is parsed
+    return req.headers.get('X-Slack-Retry-Num') is not None
@@ -0,0 +1,105 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .scheduler import scheduler
+
+# Ack-first mode: main answers Slack right away and the replies are sent from a background pool
+ACK_FIRST = os.environ.get("SLACK_ACK_FIRST", "").lower() in ("1", "true", "yes")
+WORKERS = int(os.environ.get("SLACK_DISPATCH_WORKERS", "4"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def run_actions(client, actions):
+    # Run each (method, kwargs) Slack call in order, e.g. ("chat_postMessage", {...}),
+    # through the scheduler so they stay within Slack's rate limits
+    for method, kwargs in actions:
+        scheduler.call(client, method, kwargs)
+
+
+async def run_actions_async(client, actions):
+    # Async counterpart of run_actions, the calls of one reply are independent so they run concurrently
+    results = await asyncio.gather(*(scheduler.call_async(client, method, kwargs) for method, kwargs in actions),
+                                   return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+
+_background_tasks = set()
+
+
+def defer_async(coroutine):
+    # Run the coroutine as a task on the running loop without waiting for it
+    task = asyncio.ensure_future(coroutine)
+    _background_tasks.add(task)  # Keep a reference so the task is not garbage collected mid-flight
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def submit_async(client, actions):
+    # Ack-first mode for the async handler: send the reply as a task on the running loop
+    return defer_async(_run_in_background_async(client, actions))
+
+
+async def _run_in_background_async(client, actions):
+    try:
+        await run_actions_async(client, actions)
+    except Exception as e:
+        if 'already_reacted' in str(e):
+            logging.info("The reaction has already been added to this message.")
+        else:
+            logging.error(f"Error occurred while sending Slack actions in the background: {e}")
+
+
+def _run_in_background(client, actions):
+    try:
+        run_actions(client, actions)
+    except Exception as e:
+        if 'already_reacted' in str(e):  # Same outcome as the synchronous 'thx' path
+            logging.info("The reaction has already been added to this message.")
+        else:
+            logging.error(f"Error occurred while sending Slack actions in the background: {e}")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="slack-dispatch")
+    return _executor
+
+
+def submit(client, actions):
+    # Queue the actions for the worker pool and return immediately
+    return _get_executor().submit(_run_in_background, client, actions)
+
+
+def _run_deferred(work, args):
+    try:
+        work(*args)
+    except Exception as e:
+        logging.error(f"Error occurred while running deferred work: {e}")
+
+
+def defer(work, *args):
+    # Run work(*args) on the worker pool after the response was sent, e.g. the follow-up of a button click
+    return _get_executor().submit(_run_deferred, work, args)
+
+
+def drain():
+    # Wait until everything queued so far has been sent (used on shutdown and by the benchmarks)
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+atexit.register(drain)
@@ -0,0 +1,47 @@
+import hashlib
+import hmac
+import os
+import re
+import time
+
+# Checks done on the raw request before the body is parsed: Slack's request signature, and a scan
+# of the bytes for events the bot never answers, which are acknowledged without any further work.
+
+# Signing secret of the Slack app, requests are only verified when it is set
+SIGNING_SECRET = os.environ.get("SLACK_SIGNING_SECRET", "").encode()
+# Requests signed longer ago than this (seconds) are rejected as replays
+MAX_AGE = float(os.environ.get("SLACK_SIGNATURE_MAX_AGE", "300"))
+
+# Message subtypes that never get a reply: edits, deletions and messages posted by bots
+IGNORED_SUBTYPES = ("bot_message", "message_changed", "message_deleted")
+_SUBTYPE = re.compile(rb'"subtype"\s*:\s*"(' + "|".join(IGNORED_SUBTYPES).encode() + rb')"')
+# Every payload the handler acts on has one of these types somewhere in it
+_RELEVANT = re.compile(rb'"type"\s*:\s*"(?:message|url_verification)"')
+
+
+def verify(req, body):
+    # True when the request carries a valid X-Slack-Signature made in the last MAX_AGE seconds
+    if not SIGNING_SECRET:
+        return True
+    timestamp = req.headers.get('X-Slack-Request-Timestamp')
+    signature = req.headers.get('X-Slack-Signature')
+    if not timestamp or not signature:
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > MAX_AGE:
+            return False
+    except ValueError:
+        return False
+    digest = hmac.new(SIGNING_SECRET, b"v0:" + timestamp.encode() + b":" + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"v0={digest}", signature)
+
+
+def noise(body):
+    # Why the request can be acknowledged without parsing it, or None when it needs the full handler.
+    # Only rules out what the bytes prove is irrelevant, anything unclear is parsed as usual.
+    if not _RELEVANT.search(body):
+        return 'not_message'
+    match = _SUBTYPE.search(body)
+    if match:
+        return match.group(1).decode()
+    return None
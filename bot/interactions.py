@@ -0,0 +1,93 @@
+import json
+import logging
+from urllib.parse import unquote_plus
+
+from . import analytics, threads
+
+# Block Kit interactivity: clicks on the buttons of the bot's replies arrive as form-encoded
+# "payload=<json>" requests on the same URL as the events. They are acknowledged right away,
+# the work a click triggers (counting it, marking the thread resolved) runs afterwards on the
+# dispatcher's pool. Each click is counted as outcome "clicked:<action_id>" of the intent the
+# thread was answered with, so the stats show which reply buttons get used.
+
+_PREFIX = b"payload="
+
+# action_id -> follow-up of a click, filled in with @action
+ACTIONS = {}
+
+
+def is_payload(body):
+    # True for an interactivity request, Slack sends the payload as the only form field
+    return body.startswith(_PREFIX)
+
+
+def parse(body):
+    # The JSON payload of an interactivity request, raises ValueError when it is not one
+    payload = json.loads(unquote_plus(body[len(_PREFIX):].split(b"&", 1)[0].decode()))
+    if not isinstance(payload, dict):
+        raise ValueError("The interaction payload is not a JSON object")
+    return payload
+
+
+class Click:
+    # One action of a block_actions payload, with the thread of the reply it was clicked in
+
+    __slots__ = ("action_id", "value", "user", "channel", "thread_ts")
+
+    def __init__(self, action, payload):
+        message = payload.get('message') or {}
+        container = payload.get('container') or {}
+        self.action_id = action.get('action_id')
+        self.value = action.get('value')
+        self.user = (payload.get('user') or {}).get('id')
+        self.channel = (payload.get('channel') or {}).get('id') or container.get('channel_id')
+        # The bot's replies are posted in the thread of the message they answer
+        self.thread_ts = message.get('thread_ts') or message.get('ts') or container.get('message_ts')
+
+
+def clicks(payload):
+    # The clicks of a payload, only block_actions (button clicks) carry any
+    if payload.get('type') != 'block_actions':
+        return []
+    return [Click(action, payload) for action in payload.get('actions') or []]
+
+
+def action(*action_ids):
+    # Register the decorated function as the follow-up of clicks on these action_ids
+    def register(handler):
+        for action_id in action_ids:
+            ACTIONS[action_id] = handler
+        return handler
+    return register
+
+
+def follow_up(click_list):
+    # Run the registered follow-up of each click, called in the background after the ack
+    for click in click_list:
+        handler = ACTIONS.get(click.action_id)
+        if handler is None:
+            logging.info(f"No follow-up registered for action '{click.action_id}'")
+            handler = _count
+        handler(click)
+
+
+def _count(click, outcome="clicked"):
+    intent = threads.intent(click.channel, click.thread_ts)
+    logging.info(f"User {click.user} {outcome} '{click.action_id}' in a '{intent}' reply")
+    analytics.record({"intent": intent, "channel": click.channel, "outcome": f"{outcome}:{click.action_id}"})
+
+
+# The link buttons of the built-in replies open a page in the browser, the click is only counted.
+# "button-action" is the action_id of all buttons in replies posted before they had their own.
+@action("open-sspr-unlock", "open-sspr-enroll", "open-change-password", "open-duo-ticket",
+        "open-service-desk", "button-action")
+def link_clicked(click):
+    _count(click)
+
+
+# For templates in the rules file with a "Resolved" button: the thread counts as resolved
+# as if the user wrote THX, a THX written afterwards gets no second answer
+@action("mark-resolved")
+def mark_resolved(click):
+    threads.resolve(click.channel, click.thread_ts)
+    _count(click, "resolved")
@@ -0,0 +1,46 @@
+import string
+
+# Punctuation is turned into spaces so that str.split() leaves only the words
+_SEPARATORS = str.maketrans({char: " " for char in string.punctuation})
+
+
+def words(text):
+    # Lowercased words of text, split on whitespace and punctuation
+    return text.lower().translate(_SEPARATORS).split()
+
+
+class KeywordMatcher:
+    # Finds which intent a message belongs to in one pass over the text.
+    # The message is split into words once and looked up in a keyword table, so keywords
+    # only match whole words ("lock" no longer matches "block") and the cost does not grow
+    # with the number of keywords. When a message contains keywords of several intents the
+    # one listed first wins. Keywords may be phrases of several words ("stolen laptop").
+
+    def __init__(self, intents):
+        # intents: list of (intent, keywords) in priority order, highest first
+        self._intent_for = {}
+        self._priority = {}
+        for priority, (intent, keywords) in enumerate(intents):
+            self._priority[intent] = priority
+            for keyword in keywords:
+                key = " ".join(words(keyword))
+                if key:
+                    # A keyword listed under two intents belongs to the higher priority one
+                    self._intent_for.setdefault(key, intent)
+        self._words = frozenset(key for key in self._intent_for if " " not in key)
+        self._max_phrase = max((key.count(" ") + 1 for key in self._intent_for), default=1)
+
+    def match(self, text):
+        # Return the highest priority intent found in text, or None
+        if not text:
+            return None
+        tokens = words(text)
+        hits = set(self._words.intersection(tokens))
+        for size in range(2, self._max_phrase + 1):
+            for start in range(len(tokens) - size + 1):
+                phrase = " ".join(tokens[start:start + size])
+                if phrase in self._intent_for:
+                    hits.add(phrase)
+        if not hits:
+            return None
+        return min((self._intent_for[key] for key in hits), key=self._priority.__getitem__)
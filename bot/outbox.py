@@ -0,0 +1,324 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from . import dispatcher
+from .scheduler import scheduler
+from .slack_client import get_client
+
+# Every reply is written to this local SQLite file before it is sent and removed once Slack has
+# it, so a failed post is retried instead of lost. Set SLACK_OUTBOX_DB to an empty value to turn it off.
+DB_PATH = os.environ.get("SLACK_OUTBOX_DB", os.path.join(tempfile.gettempdir(), "slack_outbox.db"))
+ENABLED = bool(DB_PATH)
+# Retry delays grow as BACKOFF_BASE * 2^attempt seconds up to BACKOFF_MAX, then the reply is given up
+BACKOFF_BASE = float(os.environ.get("SLACK_OUTBOX_BACKOFF", "2"))
+BACKOFF_MAX = float(os.environ.get("SLACK_OUTBOX_BACKOFF_MAX", "300"))
+MAX_ATTEMPTS = int(os.environ.get("SLACK_OUTBOX_MAX_ATTEMPTS", "10"))
+# Seconds a reply that was given up is kept in the file for inspection before it is deleted
+DEAD_TTL = float(os.environ.get("SLACK_OUTBOX_DEAD_TTL", str(7 * 24 * 3600)))
+# Consecutive failures that open the circuit, and how long it stays open before a trial call
+BREAKER_THRESHOLD = int(os.environ.get("SLACK_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.environ.get("SLACK_BREAKER_RESET", "30"))
+# How long a claimed entry is reserved for the worker sending it
+LEASE = 60.0
+
+# The step already happened, e.g. a second 'thx' reaction on the same message
+_DONE_ERRORS = {'already_reacted'}
+# Slack errors that only go away when Slack recovers, everything else is not worth retrying
+_TRANSIENT_ERRORS = {'ratelimited', 'internal_error', 'fatal_error', 'service_unavailable', 'request_timeout'}
+
+
+def _slack_response(error):
+    # The SlackResponse of a SlackApiError, looked up by attribute so slack_sdk need not be imported
+    response = getattr(error, "response", None)
+    return response if hasattr(response, "status_code") else None
+
+
+def is_transient(error):
+    # True when the same call may succeed later (network errors, 5xx, Slack being unavailable)
+    response = _slack_response(error)
+    if response is not None:
+        return response.status_code >= 500 or response.status_code == 429 or response.get('error') in _TRANSIENT_ERRORS
+    return isinstance(error, (OSError, TimeoutError))
+
+
+def is_done(error):
+    response = _slack_response(error)
+    return response is not None and response.get('error') in _DONE_ERRORS
+
+
+class CircuitBreaker:
+    # Stops calls to Slack after `threshold` consecutive failures, lets one trial call through
+    # after `reset` seconds and closes again when it succeeds
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset = reset
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset and not self._trial:
+                self._trial = True  # Only one trial call at a time while half open
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logging.info("Slack API recovered, circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.opened_at is None and self.failures >= self.threshold):
+                if self.opened_at is None:
+                    logging.warning(f"Slack API failing ({self.failures} in a row), circuit opened")
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class Outbox:
+    # SQLite table of replies still to send: the workspace (SLACK_BOT_TOKENS key, never the token),
+    # the (method, kwargs) actions, the index of the next action to run, attempts so far and when
+    # the next attempt is due
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.breaker = CircuitBreaker()
+        self._wake = threading.Event()
+        self._drainer = None
+        self._drainer_lock = threading.Lock()
+        self._ready = False
+
+    def _setup(self, conn):
+        # Create the table on first use, and pick up replies left over from before a host restart
+        conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            actions TEXT NOT NULL,
+            step INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            created REAL NOT NULL,
+            team TEXT)""")
+        if "team" not in {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}:
+            try:
+                conn.execute("ALTER TABLE outbox ADD COLUMN team TEXT")  # Outbox file of an earlier version
+            except sqlite3.OperationalError:
+                pass  # Another worker added it first
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+        self._ready = True
+        if conn.execute("SELECT 1 FROM outbox WHERE status = 'pending' LIMIT 1").fetchone():
+            self.wake()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            if not self._ready:
+                self._setup(conn)
+        return conn
+
+    def add(self, actions, claim=True, team=None):
+        # Store the actions and return the entry id. A claimed entry is left to the caller to
+        # send, otherwise the background drainer picks it up straight away.
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO outbox (actions, next_attempt, created, team) VALUES (?, ?, ?, ?)",
+            (json.dumps(actions), now + LEASE if claim else now, now, team))
+        if not claim:
+            self.wake()
+        return cursor.lastrowid
+
+    def complete(self, entry_id):
+        self._connect().execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def failed(self, entry_id, error, step=None):
+        # Schedule another attempt with exponential backoff, or give up on errors retrying will not fix
+        conn = self._connect()
+        row = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return
+        attempts = row[0] + 1
+        if not is_transient(error) or attempts >= MAX_ATTEMPTS:
+            logging.error(f"Giving up on Slack reply {entry_id} after {attempts} attempt(s): {error}")
+            conn.execute("UPDATE outbox SET status = 'dead', attempts = ?, error = ? WHERE id = ?",
+                         (attempts, str(error), entry_id))
+            conn.execute("DELETE FROM outbox WHERE status = 'dead' AND created < ?", (time.time() - DEAD_TTL,))
+            return
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        conn.execute("UPDATE outbox SET attempts = ?, next_attempt = ?, error = ?, step = COALESCE(?, step) "
+                     "WHERE id = ?", (attempts, time.time() + delay, str(error), step, entry_id))
+        logging.warning(f"Slack reply {entry_id} failed ({error}), retrying in {delay:.1f}s")
+        self.wake()
+
+    def _outcome(self, entry_id, step, error):
+        # Book an attempt that stopped at action `step` with `error` (None when everything was sent).
+        # Returns True when the entry is done.
+        if error is None:
+            self.breaker.record_success()
+            self.complete(entry_id)
+            return True
+        if is_transient(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()  # Slack answered, the API itself is up
+        self.failed(entry_id, error, step=step)
+        return False
+
+    def deliver(self, client, entry_id, actions, step=0, attempts=0):
+        # Run the remaining actions of an entry in order. Returns True when the entry is done.
+        for index in range(step, len(actions)):
+            method, kwargs = actions[index]
+            try:
+                scheduler.call(client, method, kwargs)
+            except Exception as e:
+                if not is_done(e):
+                    return self._outcome(entry_id, index, e)
+                logging.info(f"Slack reply {entry_id} step {index} already handled: {e.response.get('error')}")
+                if attempts == 0:
+                    # e.g. a repeated THX whose reaction is already there: the thread was answered before,
+                    # the reply is not posted again
+                    return self._outcome(entry_id, index, None)
+                # A retry after a later step failed: this step went through on an earlier attempt
+        return self._outcome(entry_id, len(actions), None)
+
+    def _book(self, entry_id, actions, results):
+        # Book actions that ran at the same time one by one. Only the ones that failed stay in the
+        # entry, so a retry neither repeats what Slack already has nor drops what it did not get.
+        # Returns True when the entry is done.
+        failed = [(action, result) for action, result in zip(actions, results)
+                  if isinstance(result, Exception) and not is_done(result)]
+        if not failed:
+            return self._outcome(entry_id, len(actions), None)
+        # Transient failures are retried. Others are given up, the entry only dies when nothing is left to retry.
+        retry = [(action, error) for action, error in failed if is_transient(error)]
+        for (method, _), error in failed:
+            if retry and not is_transient(error):
+                logging.error(f"Giving up on {method} of Slack reply {entry_id}: {error}")
+        remaining = [action for action, _ in retry or failed]
+        self._connect().execute("UPDATE outbox SET actions = ? WHERE id = ?", (json.dumps(remaining), entry_id))
+        return self._outcome(entry_id, 0, (retry or failed)[0][1])
+
+    def send(self, client, actions, inline=True, team=None):
+        # Write the reply and send it now (inline) or from the dispatcher's pool (ack-first mode).
+        # While the circuit is open nothing is sent, the request returns at once and the drainer
+        # catches up later. The drainer only sends retries and replies left over from a restart.
+        if not self.breaker.allow():
+            self.add(actions, claim=False, team=team)
+            return False
+        entry_id = self.add(actions, team=team)
+        if not inline:
+            dispatcher.defer(self.deliver, client, entry_id, actions)
+            return False
+        return self.deliver(client, entry_id, actions)
+
+    async def send_async(self, client, actions, inline=True, team=None):
+        # send() for the async handler, ack-first replies run as a task on the loop
+        if not self.breaker.allow():
+            self.add(actions, claim=False, team=team)
+            return False
+        entry_id = self.add(actions, team=team)
+        if not inline:
+            dispatcher.defer_async(self._deliver_async(client, entry_id, actions))
+            return False
+        return await self._deliver_async(client, entry_id, actions)
+
+    async def _deliver_async(self, client, entry_id, actions):
+        # The actions of the reply run concurrently
+        results = await asyncio.gather(*(scheduler.call_async(client, method, kwargs) for method, kwargs in actions),
+                                       return_exceptions=True)
+        return self._book(entry_id, actions, results)
+
+    def _claim_due(self, limit=20):
+        # Reserve the entries that are due so no other worker on this host sends them too
+        conn = self._connect()
+        now = time.time()
+        rows = conn.execute("SELECT id, actions, step, attempts, team FROM outbox "
+                            "WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                            (now, limit)).fetchall()
+        claimed = []
+        for entry_id, actions, step, attempts, team in rows:
+            cursor = conn.execute("UPDATE outbox SET next_attempt = ? WHERE id = ? AND next_attempt <= ?",
+                                  (now + LEASE, entry_id, now))
+            if cursor.rowcount:
+                claimed.append((entry_id, json.loads(actions), step, attempts, team))
+        return claimed
+
+    def _next_due_in(self):
+        row = self._connect().execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def drain_once(self):
+        # Send what is due. Returns how many entries were completed.
+        delivered = 0
+        for entry_id, actions, step, attempts, team in self._claim_due():
+            if not self.breaker.allow():
+                # Give the claim back, the entry is retried when the circuit lets calls through again
+                self._connect().execute("UPDATE outbox SET next_attempt = ? WHERE id = ?",
+                                        (time.time() + self.breaker.reset, entry_id))
+                continue
+            actions = [tuple(action) for action in actions]
+            if self.deliver(get_client(team).client, entry_id, actions, step, attempts):
+                delivered += 1
+        return delivered
+
+    def _drain_forever(self):
+        while True:
+            try:
+                self.drain_once()
+                wait = self._next_due_in()
+            except Exception as e:
+                logging.error(f"Error occurred while draining the Slack outbox: {e}")
+                wait = BACKOFF_BASE
+            self._wake.wait(timeout=min(wait if wait is not None else 60.0, 60.0))
+            self._wake.clear()
+
+    def resume(self):
+        # Called by every invocation: the first one starts the drainer, which opens the file and
+        # sends the replies left over from before a restart without waiting for a new reply
+        if self._drainer is None:
+            self.wake()
+
+    def wake(self):
+        # Make sure the drainer thread runs and look at the table now
+        if self._drainer is None:
+            with self._drainer_lock:
+                if self._drainer is None:
+                    self._drainer = threading.Thread(target=self._drain_forever, name="slack-outbox", daemon=True)
+                    self._drainer.start()
+        self._wake.set()
+
+    def pending(self):
+        row = self._connect().execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()
+        return row[0]
+
+
+# The SQLite file is opened on first use, not at import
+outbox = Outbox(DB_PATH) if ENABLED else None
@@ -0,0 +1,153 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import deque
+
+from . import dispatcher
+
+# Profiling of live invocations: a sample of them (SLACK_PROFILE_RATE), or a request carrying a
+# signed X-Bot-Profile header, runs under cProfile and tracemalloc. The profile and the top
+# allocations are written to PROFILE_DIR named after the branch taken (lock, password, duo,
+# weekend, thx, not_bot_thread, ...), benchmarks/profiles.py merges and summarizes them per branch.
+# When neither setting is there main does not call into this module at all, and cProfile and
+# tracemalloc are only imported with the first profiled invocation, off the cold start.
+RATE = float(os.environ.get("SLACK_PROFILE_RATE", "0"))
+# Secret the X-Bot-Profile header is signed with, see benchmarks/profiles.py --sign
+SECRET = os.environ.get("SLACK_PROFILE_SECRET", "").encode()
+ENABLED = RATE > 0 or bool(SECRET)
+PROFILE_DIR = os.environ.get("SLACK_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "slack_profiles"))
+# Files kept per worker, the oldest profiles are deleted beyond that
+MAX_FILES = int(os.environ.get("SLACK_PROFILE_MAX_FILES", "200"))
+# Allocation sites written per profiled invocation
+TOP_ALLOCATIONS = int(os.environ.get("SLACK_PROFILE_TOP_ALLOCATIONS", "25"))
+# Signed headers older than this (seconds) are ignored
+MAX_AGE = 300
+
+HEADER = "X-Bot-Profile"
+
+# cProfile and tracemalloc are process-wide, only one invocation is profiled at a time
+_busy = threading.Lock()
+_written = deque()
+_written_lock = threading.Lock()
+
+
+def sign(timestamp):
+    # X-Bot-Profile value asking for a profile of the request: "<timestamp>:<signature>"
+    digest = hmac.new(SECRET, str(timestamp).encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}:{digest}"
+
+
+def requested(req):
+    # True when the request carries a valid X-Bot-Profile header signed in the last MAX_AGE seconds
+    value = req.headers.get(HEADER)
+    if not SECRET or not value:
+        return False
+    timestamp, _, _ = value.partition(":")
+    try:
+        if abs(time.time() - int(timestamp)) > MAX_AGE:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign(timestamp), value)
+
+
+def _wanted(req):
+    return (requested(req) or random.random() < RATE) and _busy.acquire(blocking=False)
+
+
+def profile(handle, req, timings):
+    # handle(req, timings), under the profilers when the request is sampled or asks for it
+    if not _wanted(req):
+        return handle(req, timings)
+    profiler = _start()
+    outcome = "error"
+    try:
+        response = handle(req, timings)
+        outcome = "ignored"  # What main reports for invocations that did not set an outcome
+        return response
+    finally:
+        _stop(profiler, branch(timings.dimensions, outcome))
+
+
+async def profile_async(handle, req, timings):
+    # Async counterpart of profile. Other coroutines running on the loop meanwhile are profiled as well.
+    if not _wanted(req):
+        return await handle(req, timings)
+    profiler = _start()
+    outcome = "error"
+    try:
+        response = await handle(req, timings)
+        outcome = "ignored"
+        return response
+    finally:
+        _stop(profiler, branch(timings.dimensions, outcome))
+
+
+def branch(dimensions, outcome="ignored"):
+    # The branch an invocation took: the intent it answered, otherwise its outcome
+    name = dimensions.get("intent") if dimensions.get("outcome") == "replied" else None
+    return "".join(c if c.isalnum() or c == "_" else "_" for c in str(name or dimensions.get("outcome") or outcome))
+
+
+def _start():
+    import cProfile
+    import tracemalloc
+
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop(profiler, name):
+    # The files are written from the dispatcher's pool so the response does not wait for them,
+    # the next invocation is only profiled once they are written
+    import tracemalloc
+
+    profiler.disable()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    try:
+        dispatcher.defer(_write, profiler, snapshot, name)
+    except RuntimeError:  # The pool is shutting down
+        _busy.release()
+
+
+def _write(profiler, snapshot, name):
+    try:
+        _dump(profiler, snapshot, name)
+    finally:
+        _busy.release()
+
+
+def _dump(profiler, snapshot, name):
+    import linecache
+    import tracemalloc
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{name}-{time.time_ns()}-{os.getpid()}")
+    profiler.dump_stats(base + ".prof")
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    allocations = []
+    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        allocations.append({"file": frame.filename, "line": frame.lineno, "size": stat.size, "count": stat.count,
+                            "code": linecache.getline(frame.filename, frame.lineno).strip()})
+    with open(base + ".alloc.json", "w") as f:
+        json.dump(allocations, f)
+    logging.info(f"Wrote the profile of a '{name}' invocation to {base}.prof")
+    with _written_lock:
+        _written.append(base)
+        while len(_written) > MAX_FILES // 2:
+            oldest = _written.popleft()
+            for path in (oldest + ".prof", oldest + ".alloc.json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from . import templates
+from .matcher import KeywordMatcher
+
+# The intents the bot answers and their keywords, priorities and replies are defined in a rules
+# file. It is compiled once into a matcher per (thread, weekend) context and a dispatch table,
+# and compiled again only when the file changes. SLACK_RULES_URL loads it over HTTP instead,
+# re-fetched with If-None-Match so an unchanged file costs a 304.
+RULES_PATH = os.environ.get("SLACK_RULES_PATH", os.path.join(os.path.dirname(__file__), "rules.json"))
+RULES_URL = os.environ.get("SLACK_RULES_URL")
+# Seconds between checks for a new version of the rules
+CHECK_INTERVAL = float(os.environ.get("SLACK_RULES_CHECK_INTERVAL", "30"))
+
+_WHERE = {"message": (False,), "thread": (True,), "any": (False, True)}
+_DAYS = {"weekday": (False,), "weekend": (True,), "any": (False, True)}
+
+
+class Rule:
+    # One intent: when it applies, what triggers it and how the bot answers
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.priority = spec.get("priority", 0)
+        where = spec.get("where", "message")
+        days = spec.get("days", "any")
+        self.keywords = spec.get("keywords", [])
+        self.exact = spec.get("exact", [])
+        self.match_any = spec.get("match_any", False)
+        self.reaction = spec.get("reaction")
+        self.template = spec["template"]
+        # A wrong type would only fail while matching ("priority": "high") or match the wrong thing
+        # ("keywords": "vpn" matches the letters v, p and n), so the file is rejected here instead
+        if where not in tuple(_WHERE) or days not in tuple(_DAYS):
+            raise ValueError(f"Rule '{self.name}': unknown where {where!r} or days {days!r}")
+        if not isinstance(self.name, str) or not isinstance(self.template, str):
+            raise ValueError(f"Rule '{self.name}': name and template must be strings")
+        if isinstance(self.priority, bool) or not isinstance(self.priority, (int, float)):
+            raise ValueError(f"Rule '{self.name}': priority must be a number, not {self.priority!r}")
+        for field in ("keywords", "exact"):
+            values = getattr(self, field)
+            if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+                raise ValueError(f"Rule '{self.name}': {field} must be a list of strings, not {values!r}")
+        if not isinstance(self.match_any, bool):
+            raise ValueError(f"Rule '{self.name}': match_any must be true or false")
+        if self.reaction is not None and not isinstance(self.reaction, str):
+            raise ValueError(f"Rule '{self.name}': reaction must be an emoji name, not {self.reaction!r}")
+        self.where, self.days = _WHERE[where], _DAYS[days]
+        self.exact = [text.strip().lower() for text in self.exact]
+
+
+class _Context:
+    # The rules that apply to top-level or thread messages on weekdays or weekends, indexed for matching
+
+    def __init__(self, rules):
+        by_priority = sorted(rules, key=lambda rule: -rule.priority)
+        keyword_rules = [rule for rule in by_priority if rule.keywords]
+        self.matcher = KeywordMatcher([(rule, rule.keywords) for rule in keyword_rules])
+        self.keyword_rules = {rule.name: rule for rule in keyword_rules}
+        self.exact = {}
+        for rule in by_priority:
+            for text in rule.exact:
+                self.exact.setdefault(text, rule)
+        self.fallback = next((rule for rule in by_priority if rule.match_any), None)
+
+    def match(self, text, classify=None):
+        # classify(text, names) may pick the keyword rule instead of the keywords, see classifier.predict
+        predicted = classify(text, self.keyword_rules.keys()) if classify is not None and self.keyword_rules else None
+        if predicted is None:
+            keyword_rule = self.matcher.match(text)
+        else:
+            keyword_rule = self.keyword_rules.get(predicted)  # None for the model's "no reply" label
+        candidates = [keyword_rule, self.exact.get(text.strip().lower()), self.fallback]
+        candidates = [rule for rule in candidates if rule is not None]
+        return max(candidates, key=lambda rule: rule.priority) if candidates else None
+
+
+class RuleTable:
+    # Compiled rules file: a matching context per (thread, weekend) and a rule per intent name
+
+    def __init__(self, spec):
+        self.rules = {}
+        for rule_spec in spec["intents"]:
+            rule = Rule(rule_spec)
+            self.rules[rule.name] = rule
+        self.templates = dict(templates.TEMPLATES)
+        for name, template in spec.get("templates", {}).items():
+            self.templates[name] = templates.Template(template["text"], template.get("blocks"))
+        for rule in self.rules.values():
+            if rule.template not in self.templates:
+                raise ValueError(f"Rule '{rule.name}' uses unknown template '{rule.template}'")
+        self._contexts = {}
+        for thread in (False, True):
+            for weekend in (False, True):
+                applicable = [rule for rule in self.rules.values() if thread in rule.where and weekend in rule.days]
+                self._contexts[thread, weekend] = _Context(applicable)
+
+    def match(self, text, thread, weekend, classify=None):
+        # Name of the intent the message triggers, or None
+        rule = self._contexts[thread, weekend].match(text, classify)
+        return rule.name if rule is not None else None
+
+    def rule(self, name):
+        return self.rules.get(name)
+
+
+class _Loader:
+    # Keeps the compiled table and swaps it for a new one when the rules file changes
+
+    def __init__(self):
+        self.table = None
+        self.version = None  # mtime of the file or ETag of the URL
+        self.checked = 0.0
+        self._lock = threading.Lock()
+        self._fetching = False
+
+    def get(self):
+        now = time.monotonic()
+        if self.table is None:
+            with self._lock:
+                if self.table is None:
+                    self._reload(blocking=True)
+        elif now - self.checked >= CHECK_INTERVAL:
+            self.checked = now
+            self._reload(blocking=False)
+        return self.table
+
+    def _reload(self, blocking):
+        self.checked = time.monotonic()
+        if RULES_URL:
+            if blocking:
+                self._fetch()
+            elif not self._fetching:
+                # Never make an event wait for the network, the current rules keep serving meanwhile
+                self._fetching = True
+                threading.Thread(target=self._fetch, name="slack-rules", daemon=True).start()
+            if self.table is not None:
+                return
+        self._load_file()
+
+    def _load_file(self):
+        try:
+            mtime = os.stat(RULES_PATH).st_mtime_ns
+            if mtime == self.version and self.table is not None:
+                return
+            with open(RULES_PATH) as f:
+                self._install(json.load(f), mtime)
+        except (OSError, ValueError, KeyError) as e:
+            if self.table is None:
+                raise
+            logging.error(f"Keeping the current rules, {RULES_PATH} could not be loaded: {e}")
+
+    def _fetch(self):
+        import urllib.error
+        import urllib.request
+
+        try:
+            request = urllib.request.Request(RULES_URL)
+            if isinstance(self.version, str) and self.table is not None:
+                request.add_header("If-None-Match", self.version)
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    self._install(json.load(response), response.headers.get("ETag"))
+            except urllib.error.HTTPError as e:
+                if e.code != 304:
+                    raise
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Keeping the current rules, {RULES_URL} could not be loaded: {e}")
+        finally:
+            self._fetching = False
+
+    def _install(self, spec, version):
+        try:
+            table = RuleTable(spec)
+        except Exception as e:
+            # Whatever is wrong with the file (e.g. an intent that is not an object), it must not reach
+            # the events: the loaders keep the current table on ValueError
+            raise ValueError(f"invalid rules: {e}") from e
+        self.table, self.version = table, version
+        logging.info(f"Loaded {len(table.rules)} intent rules (version {version})")
+
+
+_loader = _Loader()
+
+
+def table():
+    # The current compiled rules, reloaded when the rules file has changed
+    return _loader.get()
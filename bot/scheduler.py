@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from . import timing
+
+# Requests per minute allowed for each Web API method we call (Slack's rate limit tiers)
+METHOD_LIMITS = {
+    "chat_postMessage": float(os.environ.get("SLACK_RATE_CHAT_POST", "300")),
+    "reactions_add": float(os.environ.get("SLACK_RATE_REACTIONS_ADD", "50")),  # Tier 3
+}
+DEFAULT_LIMIT = 100  # Tier 4, for anything not listed above
+# Slack allows about one message per second per channel, with short bursts above it
+CHANNEL_RATE = float(os.environ.get("SLACK_RATE_CHANNEL", "1"))
+CHANNEL_BURST = float(os.environ.get("SLACK_RATE_CHANNEL_BURST", "4"))
+# Calls allowed to wait for a token at the same time, further callers block until a slot frees up
+MAX_QUEUE = int(os.environ.get("SLACK_RATE_MAX_QUEUE", "200"))
+# How many times a call answered with 429 is retried after Retry-After
+MAX_RETRIES = int(os.environ.get("SLACK_RATE_MAX_RETRIES", "3"))
+
+
+class TokenBucket:
+    # Allows `rate` calls per second on average and up to `burst` calls at once
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # Take a token and return how many seconds the caller has to wait before using it
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds):
+        # Slack answered 429, nothing goes out through this bucket for the next `seconds`
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def _retry_after(error):
+    # Seconds from the Retry-After header of a 429 response, None for any other error
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 429:
+        return None
+    headers = response.headers or {}
+    value = headers.get("Retry-After") or headers.get("retry-after") or 1
+    if isinstance(value, list):
+        value = value[0]
+    return float(value)
+
+
+class Scheduler:
+    # Sends Slack calls through per-method and per-channel token buckets. 429 answers pause the
+    # bucket for Retry-After and the call is retried instead of failing. Identical calls waiting
+    # at the same time are sent once. Slack limits every workspace on its
+    # own, so the buckets are kept per client token.
+
+    def __init__(self):
+        self._methods = {}
+        self._channels = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(MAX_QUEUE)
+        self._async_loop = None
+        self._async_slots = None
+        self._async_pending = {}
+        self._stats = {"calls": 0, "coalesced": 0, "rate_limited": 0, "queue_depth": 0,
+                       "max_queue_depth": 0, "waited_calls": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def _bucket(self, buckets, key, rate, burst):
+        bucket = buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = buckets.setdefault(key, TokenBucket(rate, burst))
+        return bucket
+
+    def _buckets_for(self, team, method, kwargs):
+        # The workspace's method bucket, plus the channel bucket for messages
+        limit = METHOD_LIMITS.get(method, DEFAULT_LIMIT) / 60
+        buckets = [self._bucket(self._methods, (team, method), limit, max(1.0, limit))]
+        channel = kwargs.get("channel")
+        if channel and method == "chat_postMessage":
+            buckets.append(self._bucket(self._channels, (team, channel), CHANNEL_RATE, CHANNEL_BURST))
+        return buckets
+
+    def _reserve(self, team, method, kwargs):
+        # Wait needed before the call may go out: the longest of its buckets
+        return max(bucket.reserve() for bucket in self._buckets_for(team, method, kwargs))
+
+    def forget(self, team):
+        # Drop the buckets of a workspace whose client was evicted
+        with self._lock:
+            for buckets in (self._methods, self._channels):
+                for key in [key for key in buckets if key[0] == team]:
+                    del buckets[key]
+
+    def _record(self, key, value):
+        with self._lock:
+            self._stats[key] += value
+
+    def _enter(self):
+        with self._lock:
+            self._stats["queue_depth"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._stats["queue_depth"])
+
+    def _leave(self, waited):
+        with self._lock:
+            self._stats["queue_depth"] -= 1
+            self._stats["calls"] += 1
+            if waited > 0:
+                self._stats["waited_calls"] += 1
+                self._stats["wait_seconds"] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def _rate_limited(self, team, method, kwargs, error):
+        seconds = _retry_after(error)
+        if seconds is None:
+            return None
+        self._record("rate_limited", 1)
+        # Messages are limited per channel, everything else per method
+        self._buckets_for(team, method, kwargs)[-1].pause(seconds)
+        logging.warning(f"Slack rate limited {method}, retrying in {seconds:.1f}s")
+        return seconds
+
+    def call(self, client, method, kwargs):
+        # Send client.<method>(**kwargs) when the rate limits allow it
+        team = getattr(client, "token", None)
+        key = (team, method, tuple(sorted(kwargs.items())))
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = pending = threading.Event()
+                owner = True
+            else:
+                self._stats["coalesced"] += 1
+                owner = False
+        if not owner:
+            pending.wait()  # The same call is already queued, its result answers for both of us
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        pending.result = pending.error = None
+        self._slots.acquire()  # Backpressure: block while too many calls are waiting
+        self._enter()
+        waited = 0.0
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                wait = self._reserve(team, method, kwargs)
+                if wait > 0:
+                    with timing.current().stage(f"slack_wait.{method}"):
+                        time.sleep(wait)
+                    waited += wait
+                try:
+                    with timing.current().stage(f"slack.{method}"):
+                        pending.result = getattr(client, method)(**kwargs)
+                    return pending.result
+                except Exception as e:
+                    if attempt == MAX_RETRIES or self._rate_limited(team, method, kwargs, e) is None:
+                        raise
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+            self._leave(waited)
+            self._slots.release()
+
+    def _async_calls(self):
+        # The slots and the calls in flight of the running event loop, a new loop starts with fresh ones
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_loop = loop
+            self._async_slots = asyncio.Semaphore(MAX_QUEUE)
+            self._async_pending = {}
+        return self._async_slots, self._async_pending
+
+    async def call_async(self, client, method, kwargs):
+        # Same as call() for an AsyncWebClient: identical calls in flight are sent once, at most
+        # MAX_QUEUE calls wait at a time and waiting is done with asyncio.sleep instead of blocking
+        team = getattr(client, "token", None)
+        slots, in_flight = self._async_calls()
+        key = (team, method, tuple(sorted(kwargs.items())))
+        pending = in_flight.get(key)
+        if pending is not None:
+            self._record("coalesced", 1)
+            return await asyncio.shield(pending)  # One caller giving up does not cancel the call for the others
+
+        in_flight[key] = pending = asyncio.get_running_loop().create_future()
+        try:
+            async with slots:  # Backpressure: wait while too many calls are waiting
+                result = await self._send_async(team, client, method, kwargs)
+            pending.set_result(result)
+            return result
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception()  # Retrieved, so no warning is logged when nobody else was waiting
+            raise
+        except BaseException:
+            pending.cancel()
+            raise
+        finally:
+            in_flight.pop(key, None)
+
+    async def _send_async(self, team, client, method, kwargs):
+        self._enter()
+        waited = 0.0
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                wait = self._reserve(team, method, kwargs)
+                if wait > 0:
+                    with timing.current().stage(f"slack_wait.{method}"):
+                        await asyncio.sleep(wait)
+                    waited += wait
+                try:
+                    with timing.current().stage(f"slack.{method}"):
+                        return await getattr(client, method)(**kwargs)
+                except Exception as e:
+                    if attempt == MAX_RETRIES or self._rate_limited(team, method, kwargs, e) is None:
+                        raise
+        finally:
+            self._leave(waited)
+
+    def metrics(self):
+        # Snapshot of the queue depth, wait time and rate limit counters
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_wait_seconds"] = stats["wait_seconds"] / stats["waited_calls"] if stats["waited_calls"] else 0.0
+        return stats
+
+
+scheduler = Scheduler()
+timing.gauge("scheduler", scheduler.metrics)
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import os
+import ssl
+import threading
+import time
+from collections import OrderedDict
+
+from .scheduler import scheduler
+
+# How long (seconds) we trust the bot identity returned by auth.test before asking again
+IDENTITY_TTL = float(os.environ.get("SLACK_IDENTITY_TTL", "3600"))
+
+# Slack Web API base URL, overridable so benchmarks can point the bot at a local stand-in server
+API_URL = os.environ.get("SLACK_API_URL", "https://slack.com/api/")
+
+# Connections kept open per worker by the shared aiohttp session of the async handler
+ASYNC_POOL_SIZE = int(os.environ.get("SLACK_ASYNC_POOL_SIZE", "100"))
+
+# Messages of a thread read to see whether the bot answered it, its reply is among the first ones
+THREAD_CHECK_LIMIT = 20
+
+# Bot tokens of the workspaces one deployment serves, as a JSON object keyed by team_id, api_app_id
+# or "<api_app_id>:<team_id>". Events of other workspaces use SLACK_BOT_TOKEN.
+TEAM_TOKENS = json.loads(os.environ.get("SLACK_BOT_TOKENS") or "{}")
+# Workspace clients kept per worker, the least recently used one is dropped beyond that
+MAX_TEAMS = int(os.environ.get("SLACK_MAX_TEAMS", "50"))
+
+# One SSL context for the whole worker, so the CA bundle is loaded once instead of on every API call.
+# It is created with the first client rather than at import, which keeps it off the cold start.
+_ssl_context = None
+
+
+def ssl_context():
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def team_key(req_body):
+    # The SLACK_BOT_TOKENS entry an event belongs to, None for the default workspace
+    team_id = req_body.get('team_id')
+    if not team_id and req_body.get('authorizations'):
+        team_id = req_body['authorizations'][0].get('team_id')
+    app_id = req_body.get('api_app_id')
+    for key in (f"{app_id}:{team_id}", team_id, app_id):
+        if key in TEAM_TOKENS:
+            return key
+    return None
+
+
+def token_for(team=None):
+    if team is not None and team in TEAM_TOKENS:
+        return TEAM_TOKENS[team]
+    return os.environ.get("SLACK_BOT_TOKEN")  # Slack token
+
+
+class CachedClient:
+    # Holds a WebClient for one token together with the bot user ID it resolves to
+
+    def __init__(self, token):
+        # slack_sdk is imported here, so events that never reach Slack do not pay for it
+        from slack_sdk import WebClient
+
+        self.token = token
+        self.client = WebClient(token, base_url=API_URL, ssl=ssl_context())
+        self._bot_id = None
+        self._bot_id_expires = 0.0
+        self._lock = threading.Lock()
+
+    def bot_id(self):
+        # Return the cached bot user ID, calling auth.test only when it is missing or expired
+        if self._bot_id is not None and time.monotonic() < self._bot_id_expires:
+            return self._bot_id
+        with self._lock:
+            if self._bot_id is None or time.monotonic() >= self._bot_id_expires:
+                self._bot_id = self.client.api_call("auth.test")['user_id']
+                self._bot_id_expires = time.monotonic() + IDENTITY_TTL
+                logging.info(f"Resolved bot identity: {self._bot_id}")
+        return self._bot_id
+
+    def answered_thread(self, channel, thread_ts):
+        # Whether the bot posted in the thread, for replies the thread cache does not know. When Slack
+        # cannot tell (e.g. the app lacks the history scope) the reply is answered rather than lost.
+        bot_id = self.bot_id()
+        try:
+            response = scheduler.call(self.client, "conversations_replies",
+                                      {"channel": channel, "ts": thread_ts, "limit": THREAD_CHECK_LIMIT})
+        except Exception as e:
+            logging.warning(f"Could not read thread {thread_ts}, answering the reply anyway: {e}")
+            return True
+        return any(message.get('user') == bot_id for message in response.get('messages') or [])
+
+
+# Clients live at module level so they survive between warm invocations of the function.
+# One per workspace token, each with its own identity cache, in least recently used order.
+_clients = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def _evict(clients):
+    # Drop the least recently used workspaces beyond MAX_TEAMS, with their rate limit state
+    while len(clients) > MAX_TEAMS:
+        token, _ = clients.popitem(last=False)
+        scheduler.forget(token)
+
+
+def get_client(team=None):
+    # Return the cached client of the event's workspace (see team_key), building it on first use.
+    # A rotated token simply gets a new client, the old one ages out of the registry.
+    token = token_for(team)
+    with _registry_lock:
+        cached = _clients.get(token)
+        if cached is None:
+            _clients[token] = cached = CachedClient(token)
+            _evict(_clients)
+        else:
+            _clients.move_to_end(token)
+        return cached
+
+
+class AsyncCachedClient:
+    # Async counterpart of CachedClient: an AsyncWebClient on a shared aiohttp session
+
+    def __init__(self, token, session):
+        from slack_sdk.web.async_client import AsyncWebClient
+
+        self.token = token
+        self.session = session
+        self.client = AsyncWebClient(token, base_url=API_URL, session=session)
+        self._bot_id = None
+        self._bot_id_expires = 0.0
+        self._lock = asyncio.Lock()
+
+    async def bot_id(self):
+        if self._bot_id is not None and time.monotonic() < self._bot_id_expires:
+            return self._bot_id
+        async with self._lock:
+            if self._bot_id is None or time.monotonic() >= self._bot_id_expires:
+                response = await self.client.api_call("auth.test")
+                self._bot_id = response['user_id']
+                self._bot_id_expires = time.monotonic() + IDENTITY_TTL
+                logging.info(f"Resolved bot identity: {self._bot_id}")
+        return self._bot_id
+
+    async def answered_thread(self, channel, thread_ts):
+        bot_id = await self.bot_id()
+        try:
+            response = await scheduler.call_async(self.client, "conversations_replies",
+                                                  {"channel": channel, "ts": thread_ts, "limit": THREAD_CHECK_LIMIT})
+        except Exception as e:
+            logging.warning(f"Could not read thread {thread_ts}, answering the reply anyway: {e}")
+            return True
+        return any(message.get('user') == bot_id for message in response.get('messages') or [])
+
+
+# The async clients of all workspaces share one aiohttp session (and so its pool of connections
+# to Slack) per event loop, the token only goes into the request headers
+_async_session = None
+_async_loop = None
+_async_clients = OrderedDict()
+
+
+async def get_async_client(team=None):
+    # Return the cached async client of the event's workspace, starting a new session if the event loop changed
+    global _async_session, _async_loop
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    session = _async_session
+    if session is None or session.closed or _async_loop is not loop:
+        if session is not None and _async_loop is loop:
+            await session.close()
+        connector = aiohttp.TCPConnector(limit=ASYNC_POOL_SIZE, ssl=ssl_context())
+        _async_session = session = aiohttp.ClientSession(connector=connector)
+        _async_loop = loop
+        _async_clients.clear()
+    token = token_for(team)
+    cached = _async_clients.get(token)
+    if cached is None:
+        _async_clients[token] = cached = AsyncCachedClient(token, session)
+        _evict(_async_clients)
+    else:
+        _async_clients.move_to_end(token)
+    return cached
+
+
+async def close_async_client():
+    # Close the shared aiohttp session, e.g. before the event loop shuts down
+    global _async_session
+    session, _async_session = _async_session, None
+    _async_clients.clear()
+    if session is not None:
+        await session.close()
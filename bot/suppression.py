@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Limits on automatic replies to new messages: one user writing "vpn not working", "locked out",
+# "can't login" in a row gets the unlock answer once, and during an incident a channel does not
+# fill up with identical bot threads. A window of 0 turns that check off.
+USER_WINDOW = float(os.environ.get("SLACK_SUPPRESS_USER_WINDOW", "600"))
+USER_LIMIT = int(os.environ.get("SLACK_SUPPRESS_USER_LIMIT", "1"))
+CHANNEL_WINDOW = float(os.environ.get("SLACK_SUPPRESS_CHANNEL_WINDOW", "300"))
+CHANNEL_LIMIT = int(os.environ.get("SLACK_SUPPRESS_CHANNEL_LIMIT", "5"))
+# Keys remembered per window, the least recently used one is dropped beyond that
+MAX_KEYS = int(os.environ.get("SLACK_SUPPRESS_MAX_KEYS", "10000"))
+# Time slices a window is counted in, the window slides by one slice at a time
+BUCKETS = 10
+
+
+class SlidingWindow:
+    # Replies per key over the last `window` seconds. Each key only keeps the counts of the
+    # slices still inside the window, so memory is bounded by MAX_KEYS * BUCKETS small ints.
+
+    def __init__(self, window, limit, max_keys=MAX_KEYS, buckets=BUCKETS):
+        self.window = window
+        self.limit = limit
+        self.max_keys = max_keys
+        self.buckets = buckets
+        self.width = window / buckets if window > 0 else 0.0
+        self._keys = OrderedDict()  # key -> {slice: count}
+
+    def _slices(self, key, now):
+        slices = self._keys.get(key)
+        if slices is None:
+            return None
+        current = int(now // self.width)
+        for old in [slot for slot in slices if slot <= current - self.buckets]:
+            del slices[old]
+        self._keys.move_to_end(key)
+        return slices
+
+    def full(self, key, now):
+        # True when key already had `limit` replies within the window
+        if self.width == 0:
+            return False
+        slices = self._slices(key, now)
+        return slices is not None and sum(slices.values()) >= self.limit
+
+    def add(self, key, now):
+        if self.width == 0:
+            return
+        slices = self._slices(key, now)
+        if slices is None:
+            self._keys[key] = slices = {}
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        current = int(now // self.width)
+        slices[current] = slices.get(current, 0) + 1
+
+    def __len__(self):
+        return len(self._keys)
+
+
+_user = SlidingWindow(USER_WINDOW, USER_LIMIT)
+_channel = SlidingWindow(CHANNEL_WINDOW, CHANNEL_LIMIT)
+_lock = threading.Lock()
+suppressed = Counter()
+
+
+def check(event, intent):
+    # Count a reply to a new message and return None, or return 'user' / 'channel' when that
+    # window is full and the reply should be skipped. Thread replies are limited by threads.py.
+    if event.get('thread_ts'):
+        return None
+    now = time.time()
+    user_key = (event.get('user'), intent)
+    channel_key = (event.get('channel'), intent)
+    with _lock:
+        if _user.full(user_key, now):
+            scope = 'user'
+        elif _channel.full(channel_key, now):
+            scope = 'channel'
+        else:
+            _user.add(user_key, now)
+            _channel.add(channel_key, now)
+            return None
+        suppressed[scope] += 1
+        return scope
+
+
+def metrics():
+    # Replies suppressed so far by each window and the keys they track
+    with _lock:
+        return {"suppressed_user": suppressed['user'], "suppressed_channel": suppressed['channel'],
+                "user_keys": len(_user), "channel_keys": len(_channel)}
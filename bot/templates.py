@@ -0,0 +1,217 @@
+import json
+
+# Block Kit replies of the bot. They are built and JSON-encoded once when the module is
+# imported, a reply only adds the channel and thread_ts of the message it answers.
+
+
+def _button_section(text, button_text, url, action_id):
+    return {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": text
+        },
+        "accessory": {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": button_text,
+                "emoji": True
+            },
+            "value": "click_me_123",
+            "url": url,
+            "action_id": action_id
+        }
+    }
+
+
+_DIVIDER = {"type": "divider"}
+
+# "Write THX if you resolved the issue. Write HELP if you require additional assistance."
+_RESOLVE_PROMPT = {
+    "type": "rich_text",
+    "elements": [
+        {
+            "type": "rich_text_section",
+            "elements": [
+                {
+                    "type": "text",
+                    "text": "Write "
+                },
+                {
+                    "type": "text",
+                    "text": "THX ",
+                    "style": {
+                        "bold": True
+                    }
+                },
+                {
+                    "type": "text",
+                    "text": "if you resolved the issue.\nWrite "
+                },
+                {
+                    "type": "text",
+                    "text": "HELP",
+                    "style": {
+                        "bold": True
+                    }
+                },
+                {
+                    "type": "text",
+                    "text": " if you require additional assistance."
+                }
+            ]
+        }
+    ]
+}
+
+SSPR_UNLOCK_URL = "https://confluence.infobip.com/display/CWT/Self+service+password+reset+-+how+to+unlock+your+account"
+SSPR_ENROLL_URL = "https://confluence.infobip.com/display/CWT/Self+service+password+reset+-+add+additional+sign-in+method"
+CHANGE_PASSWORD_URL = "https://account.activedirectory.windowsazure.com/ChangePassword.aspx"
+DUO_TICKET_URL = "https://jira.infobip.com/plugins/servlet/theme/portal/3/create/114"
+SERVICE_DESK_URL = "https://jira.infobip.com/servicedesk/customer/portal/3"
+ON_CALL_URL = "https://confluence.infobip.com/display/RCIS/RA+CIS+-+Weekend+On-Call+duty"
+
+
+def _urgent_item(text):
+    return {
+        "type": "rich_text_section",
+        "elements": [
+            {
+                "type": "text",
+                "text": text
+            }
+        ]
+    }
+
+
+_URGENT_BLOCKS = [
+    {
+        "type": "rich_text",
+        "elements": [
+            {
+                "type": "rich_text_section",
+                "elements": [
+                    {
+                        "type": "text",
+                        "text": "What is an emergency?",
+                        "style": {
+                            "bold": True
+                        }
+                    },
+                    {
+                        "type": "text",
+                        "text": "\n"
+                    }
+                ]
+            },
+            {
+                "type": "rich_text_list",
+                "style": "bullet",
+                "indent": 0,
+                "border": 0,
+                "elements": [
+                    _urgent_item("Urgent domain account problem (locked, expired, password reset)"),
+                    _urgent_item("The device is stolen (mobile phone, laptop)"),
+                    _urgent_item("BitLocker encryption problems"),
+                    _urgent_item("DUO problem"),
+                ]
+            },
+            {
+                "type": "rich_text_section",
+                "elements": [
+                    {
+                        "type": "text",
+                        "text": "On-Call Schedule information can be found "
+                    },
+                    {
+                        "type": "link",
+                        "url": ON_CALL_URL,
+                        "text": "HERE"
+                    },
+                    {
+                        "type": "text",
+                        "text": "\nOn-Duty phone number:\n"
+                    },
+                    {
+                        "type": "link",
+                        "url": "tel:+385993038199",
+                        "text": "+385 99 3038 199"
+                    }
+                ]
+            }
+        ]
+    }
+]
+
+
+class Template:
+    # One reply: the blocks are kept as a ready JSON string, text is the notification fallback
+
+    def __init__(self, text, blocks=None):
+        self.text = text
+        self.blocks = json.dumps(blocks, separators=(",", ":")) if blocks is not None else None
+        self._fields = {"text": text}
+        if self.blocks is not None:
+            self._fields["blocks"] = self.blocks
+
+    def render(self, channel, thread_ts):
+        # chat_postMessage arguments for a reply in the given thread
+        payload = {"channel": channel, "thread_ts": thread_ts}
+        payload.update(self._fields)
+        return payload
+
+
+TEMPLATES = {
+    # Unlock / SSPR reply
+    'lock': Template("Hi, note that you can unlock yourself with SSPR", [
+        _DIVIDER,
+        _button_section("Hi, note that you can unlock yourself with SSPR", "Unlock account", SSPR_UNLOCK_URL,
+                        "open-sspr-unlock"),
+        _DIVIDER,
+        _button_section("To access the SSPR you must be enrolled", "Enroll to SSPR", SSPR_ENROLL_URL,
+                        "open-sspr-enroll"),
+        _DIVIDER,
+        _RESOLVE_PROMPT,
+    ]),
+    # Password expired reply
+    'password': Template("Password has expired ?", [
+        _DIVIDER,
+        _button_section("Password has expired ?", "Reset password", CHANGE_PASSWORD_URL, "open-change-password"),
+        _DIVIDER,
+        _RESOLVE_PROMPT,
+    ]),
+    # DUO re-enrollment reply
+    'duo': Template("If you need to re-enroll to DUO 2FA raise the ticket", [
+        _DIVIDER,
+        _button_section("If you need to re-enroll to DUO 2FA raise the ticket ", "Here", DUO_TICKET_URL,
+                        "open-duo-ticket"),
+        _DIVIDER,
+        _RESOLVE_PROMPT,
+    ]),
+    # Reply to every new message during the weekend
+    'weekend': Template("Password expired? Unlock yourself with SSPR or open a ticket on our Corporate IT Service Desk", [
+        _DIVIDER,
+        _button_section("Password expired?", "Reset password", CHANGE_PASSWORD_URL, "open-change-password"),
+        _DIVIDER,
+        _button_section("Unlock yourself with SSPR", "Unlock account", SSPR_UNLOCK_URL, "open-sspr-unlock"),
+        _DIVIDER,
+        _button_section("For non-urgent problems, please open a ticket on our Corporate IT Service Desk",
+                        "Service desk", SERVICE_DESK_URL, "open-service-desk"),
+        _DIVIDER,
+        {
+            "type": "section",
+            "text": {
+                "type": "plain_text",
+                "text": "If this is urgent, please write 'urgent' in this thread",
+                "emoji": True
+            }
+        },
+        _DIVIDER,
+    ]),
+    # Weekend 'urgent' in a thread: what counts as an emergency and who is on call
+    'urgent': Template("What is an emergency? On-Call Schedule information and the On-Duty phone number",
+                       _URGENT_BLOCKS),
+    'thx': Template("Resolved"),
+    'help': Template("Soon an IT agent will assist you. Thank you for your patience."),
+}
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Threads the bot started by answering a message, so replies in other threads are dropped without
+# any work and a second THX / HELP / urgent in the same thread is not answered twice.
+MAX_SIZE = int(os.environ.get("SLACK_THREADS_MAX_SIZE", "20000"))
+# How long (seconds) a thread is remembered after the bot last did something in it
+TTL = float(os.environ.get("SLACK_THREADS_TTL", str(14 * 24 * 3600)))
+# SQLite file the threads are also written to so they survive a host restart, empty to keep them in memory only
+DB_PATH = os.environ.get("SLACK_THREADS_DB", os.path.join(tempfile.gettempdir(), "slack_threads.db"))
+
+
+class ThreadState:
+    # The intent the bot answered the thread's first message with and the thread intents handled since
+
+    __slots__ = ("intent", "handled", "expires")
+
+    def __init__(self, intent, handled=(), expires=0.0):
+        self.intent = intent
+        self.handled = set(handled)
+        self.expires = expires
+
+    @property
+    def resolved(self):
+        return 'thx' in self.handled
+
+
+class ThreadCache:
+    # LRU of ThreadState by (channel, thread_ts), bounded by size and TTL, optionally backed by SQLite
+
+    def __init__(self, max_size=MAX_SIZE, ttl=TTL, path=DB_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS threads (channel TEXT NOT NULL, thread_ts TEXT NOT NULL, "
+                         "intent TEXT, handled TEXT NOT NULL, expires REAL NOT NULL, "
+                         "PRIMARY KEY (channel, thread_ts))")
+            conn.execute("CREATE INDEX IF NOT EXISTS threads_expires ON threads (expires)")
+            self._local.conn = conn
+        return conn
+
+    def _put(self, key, state):
+        with self._lock:
+            self._items[key] = state
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get(self, channel, thread_ts):
+        key = (channel, thread_ts)
+        with self._lock:
+            state = self._items.get(key)
+            if state is not None:
+                self._items.move_to_end(key)
+        if state is None and self.path:
+            row = self._connect().execute("SELECT intent, handled, expires FROM threads "
+                                          "WHERE channel = ? AND thread_ts = ?", key).fetchone()
+            if row is not None:
+                state = ThreadState(row[0], filter(None, row[1].split(",")), row[2])
+                self._put(key, state)
+        if state is None or state.expires < time.time():
+            return None
+        return state
+
+    def _save(self, key, state):
+        state.expires = time.time() + self.ttl
+        self._put(key, state)
+        if self.path:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO threads (channel, thread_ts, intent, handled, expires) "
+                         "VALUES (?, ?, ?, ?, ?)", (*key, state.intent, ",".join(sorted(state.handled)), state.expires))
+            self._writes += 1
+            if self._writes % 1000 == 0:  # Keep the file bounded too, purging now and then instead of on every write
+                conn.execute("DELETE FROM threads WHERE expires < ?", (time.time(),))
+
+    def started(self, channel, ts, intent):
+        # The bot answered a new message, its ts becomes the thread_ts of the replies
+        self._save((channel, ts), ThreadState(intent))
+
+    def handled(self, channel, thread_ts, intent):
+        state = self.get(channel, thread_ts) or ThreadState(None)
+        state.handled.add(intent)
+        self._save((channel, thread_ts), state)
+
+
+_cache = ThreadCache()
+
+
+def known(event):
+    # False for a reply in a thread the bot never answered, such replies need no further work
+    thread_ts = event.get('thread_ts')
+    return not thread_ts or _cache.get(event.get('channel'), thread_ts) is not None
+
+
+def already_handled(event, intent):
+    # True when the bot already answered this intent in the reply's thread (e.g. a second THX)
+    thread_ts = event.get('thread_ts')
+    if not thread_ts:
+        return False
+    state = _cache.get(event.get('channel'), thread_ts)
+    return state is not None and intent in state.handled
+
+
+def record(event, intent):
+    # Remember what the bot answered: a new thread for a top-level message, a handled intent for a reply
+    thread_ts = event.get('thread_ts')
+    if thread_ts:
+        _cache.handled(event.get('channel'), thread_ts, intent)
+    else:
+        _cache.started(event.get('channel'), event.get('ts'), intent)
+
+
+def intent(channel, thread_ts):
+    # The intent the bot answered the thread's first message with, None for threads it does not know
+    state = _cache.get(channel, thread_ts) if thread_ts else None
+    return state.intent if state is not None else None
+
+
+def resolve(channel, thread_ts):
+    # Mark the thread resolved as if the user wrote THX, e.g. from a button in the reply
+    if thread_ts:
+        _cache.handled(channel, thread_ts, 'thx')
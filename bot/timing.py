@@ -0,0 +1,141 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager, nullcontext
+
+# Fraction of invocations whose stage timings are recorded (0 turns it off, 1 records all of them)
+SAMPLE_RATE = float(os.environ.get("SLACK_TIMING_SAMPLE_RATE", "0.1"))
+
+# Timings of the invocation running in this thread / task, so code deep in the call stack
+# (e.g. the scheduler making the Slack calls) can add its stages without passing it around
+_current = contextvars.ContextVar("slack_bot_timings", default=None)
+
+_histograms = None
+
+# name -> function returning {key: number}, e.g. the scheduler's queue depth and wait times, reported
+# with the timings of each sampled invocation, see gauge()
+_gauges = {}
+
+# Dimensions kept for the analytics counters but not sent with the timings, they have too many values
+_LOCAL = {"channel"}
+
+
+def _exporter():
+    # OpenTelemetry histograms exported to Application Insights when azure-monitor-opentelemetry is
+    # installed and APPLICATIONINSIGHTS_CONNECTION_STRING is set, otherwise None and we log instead
+    global _histograms
+    if _histograms is None:
+        _histograms = False
+        if os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING"):
+            try:
+                from azure.monitor.opentelemetry import configure_azure_monitor
+                from opentelemetry import metrics
+            except ImportError:
+                pass
+            else:
+                configure_azure_monitor()
+                meter = metrics.get_meter("slack_bot")
+                meter.create_observable_gauge("slack_bot.gauge", callbacks=[_observe])
+                _histograms = (
+                    meter.create_histogram("slack_bot.handler_duration", unit="ms"),
+                    meter.create_histogram("slack_bot.stage_duration", unit="ms"),
+                )
+    return _histograms or None
+
+
+def gauge(name, read):
+    # Report read()'s numbers as state of the worker: the slack_bot.gauge metric (dimensions source and
+    # metric) with OpenTelemetry, otherwise a "gauges" field of the logged timings
+    _gauges[name] = read
+
+
+def _read_gauges():
+    return {name: read() for name, read in list(_gauges.items())}
+
+
+def _observe(options):
+    from opentelemetry.metrics import Observation
+
+    for name, values in _read_gauges().items():
+        for key, value in values.items():
+            yield Observation(value, {"source": name, "metric": key})
+
+
+class Timings:
+    # Durations (ms) of the stages of one invocation plus dimensions describing it
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.dimensions = {}
+        self._token = _current.set(self)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def set(self, **dimensions):
+        self.dimensions.update(dimensions)
+
+    def emit(self, **dimensions):
+        # Send the timings as custom metrics (or one structured log line) and detach from the context
+        self.dimensions.update(dimensions)
+        self.dimensions.setdefault("outcome", "ignored")
+        total = (time.perf_counter() - self.started) * 1000
+        _current.reset(self._token)
+        attributes = {key: str(value) for key, value in self.dimensions.items() if key not in _LOCAL}
+        histograms = _exporter()
+        if histograms:
+            handler, stage = histograms
+            handler.record(total, attributes)
+            for name, duration in self.stages.items():
+                stage.record(duration, {**attributes, "stage": name})
+        else:
+            record = {"total_ms": round(total, 3), "stages_ms": {k: round(v, 3) for k, v in self.stages.items()}}
+            record.update((key, value) for key, value in self.dimensions.items() if key not in _LOCAL)
+            if _gauges:
+                record["gauges"] = {name: {key: round(value, 3) for key, value in values.items()}
+                                    for name, values in _read_gauges().items()}
+            logging.info(f"slack_bot_timing {json.dumps(record)}")
+
+
+class _NoTimings:
+    # Stands in for Timings on invocations that are not sampled: nothing is timed or reported,
+    # only the dimensions are kept for the analytics counters
+
+    __slots__ = ("dimensions",)
+    _stage = nullcontext()
+
+    def __init__(self):
+        self.dimensions = {}
+
+    def stage(self, name):
+        return self._stage
+
+    def set(self, **dimensions):
+        self.dimensions.update(dimensions)
+
+    def emit(self, **dimensions):
+        self.dimensions.update(dimensions)
+
+
+NO_TIMINGS = _NoTimings()
+
+
+def start():
+    # Timings for a new invocation, or a _NoTimings when this one is not sampled
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return Timings()
+    return _NoTimings()
+
+
+def current():
+    # Timings of the invocation in progress (NO_TIMINGS outside of a sampled one)
+    return _current.get() or NO_TIMINGS
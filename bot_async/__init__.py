@@ -0,0 +1,62 @@
+import azure.functions as func
+import json
+
+from ..bot import analytics, decide, dispatcher, not_bot_thread, profiling, receive, send_failed, timing
+from ..bot.outbox import outbox
+from ..bot.slack_client import get_async_client
+
+# Same bot as the bot function, but the Slack calls are awaited on the worker's event loop
+# instead of blocking a thread, so one worker can keep many events in flight.
+
+
+async def send(client, actions, team=None):
+    # Await the Slack calls, or leave them running as a task in ack-first mode.
+    # With the outbox on, the reply is stored first and retried from there if Slack fails.
+    if outbox is not None:
+        await outbox.send_async(client, actions, inline=not dispatcher.ACK_FIRST, team=team)
+    elif dispatcher.ACK_FIRST:
+        dispatcher.submit_async(client, actions)
+    else:
+        await dispatcher.run_actions_async(client, actions)
+    return func.HttpResponse(json.dumps({}), status_code=200, mimetype='application/json')
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    # Time the stages of a sample of the invocations and report them with the branch taken,
+    # and count every invocation for the analytics. With profiling set up some run under cProfile.
+    timings = timing.start()
+    response = None
+    try:
+        if profiling.ENABLED:
+            response = await profiling.profile_async(handle, req, timings)
+        else:
+            response = await handle(req, timings)
+        return response
+    finally:
+        if response is None:
+            timings.set(outcome='error')
+        timings.emit(status=response.status_code if response is not None else 500)
+        analytics.record(timings.dimensions)
+
+
+async def handle(req, timings):
+    # The checks and the decision are bot's, only the Slack calls are awaited here
+    incoming = receive(req, timings)
+    if isinstance(incoming, func.HttpResponse):
+        return incoming
+    slack = await get_async_client(incoming.team)
+    with timings.stage("identity"):
+        bot_id = await slack.bot_id()
+    if incoming.unverified:
+        with timings.stage("thread"):
+            answered = await slack.answered_thread(incoming.event.get('channel'), incoming.event.get('thread_ts'))
+        if not answered:
+            return not_bot_thread(timings)
+    response, intent, actions = decide(incoming, bot_id, timings)
+    if response is not None:
+        return response
+    try:
+        # The reaction and the "Resolved" reply of a 'thx' are sent at the same time
+        return await send(slack.client, actions, incoming.team)
+    except Exception as e:
+        return send_failed(intent, e)
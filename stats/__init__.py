@@ -0,0 +1,23 @@
+import azure.functions as func
+import json
+
+from ..bot import analytics
+
+# Aggregated counts of what the bot handled, from the analytics files the bot functions append to.
+# GET /api/stats?days=7&by=intent,outcome (by: any of hour, intent, channel, outcome)
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    if not analytics.ENABLED:
+        return func.HttpResponse("Analytics are turned off (SLACK_ANALYTICS_DIR is empty)", status_code=404)
+    try:
+        days = int(req.params.get('days', '7'))
+    except ValueError:
+        return func.HttpResponse("days must be a number", status_code=400)
+    by = [field for field in req.params.get('by', 'intent,outcome').split(',') if field]
+    unknown = [field for field in by if field not in analytics.FIELDS]
+    if unknown or not 1 <= days <= 366:
+        return func.HttpResponse(f"by must be a list of {', '.join(analytics.FIELDS)} and days 1 to 366",
+                                 status_code=400)
+    stats = analytics.query(days, by)
+    return func.HttpResponse(json.dumps(stats), status_code=200, mimetype='application/json')